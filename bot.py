@@ -4,6 +4,9 @@ import os
 import sys
 import asyncio
 import logging
+import queue
+import reprlib
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 import discord
@@ -12,21 +15,37 @@ from dotenv import load_dotenv
 
 from error_handler import ErrorHandler
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('ritual_war.log')
-    ]
-)
+# Setup logging: the event loop only enqueues records, a listener thread does the writes
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_handlers = [logging.StreamHandler(), logging.FileHandler('ritual_war.log')]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+
+_log_queue = queue.Queue(-1)
+log_listener = QueueListener(_log_queue, *_log_handlers)
+logging.getLogger().setLevel(logging.INFO)
+logging.getLogger().addHandler(QueueHandler(_log_queue))
 logger = logging.getLogger(__name__)
 
 
+def _brief(obj, limit: int = 500) -> str:
+    """reprlib-bounded repr of event args.
+
+    Containers, strings and nesting are bounded while the repr is built; other objects
+    still get their full builtin repr() first and are then shortened with a '...' marker.
+    """
+    r = reprlib.Repr()
+    r.maxlevel = 3
+    r.maxtuple = r.maxlist = r.maxdict = 10
+    r.maxstring = limit
+    r.maxother = limit
+    return r.repr(obj)
+
+
 def load_or_prompt_env():
     """Load environment variables or prompt for token if missing."""
     load_dotenv()
+    appends = []
     
     token = os.getenv('DISCORD_TOKEN')
     if not token:
@@ -37,16 +56,17 @@ def load_or_prompt_env():
             logger.error("No token provided. Exiting.")
             sys.exit(1)
         
-        # Save token to .env file
-        env_path = Path('.env')
-        with env_path.open('a') as f:
-            f.write(f"\nDISCORD_TOKEN={token}\n")
-        logger.info("Token saved to .env file")
+        appends.append(f"\nDISCORD_TOKEN={token}\n")
     
     # Set timezone if not specified
     if not os.getenv('TIMEZONE'):
-        with open('.env', 'a') as f:
-            f.write("TIMEZONE=America/Los_Angeles\n")
+        appends.append("TIMEZONE=America/Los_Angeles\n")
+    
+    # Save any missing settings to .env in a single write
+    if appends:
+        with Path('.env').open('a') as f:
+            f.writelines(appends)
+        logger.info("Saved missing settings to .env file")
     
     return token
 
@@ -69,49 +89,44 @@ class RitualWarBot(commands.Bot):
         owner_id = int(os.getenv('BOT_OWNER_ID', '192433389855309833'))
         self.error_handler = ErrorHandler(self, owner_id)
     
-    async def setup_hook(self):
-        """Setup hook called when the bot is ready."""
-        logger.info("Setting up Ritual War bot...")
-        
+    async def _load_extension(self, name: str, label: str, failure_label: str = None):
+        """Load one extension, notifying the owner and re-raising on failure."""
+        failure_label = failure_label or label
         try:
-            # Load the game commands cog
-            await self.load_extension('game.commands')
-            logger.info("Loaded game commands")
+            await self.load_extension(name)
+            logger.info("Loaded %s", label)
         except Exception as e:
-            await self.error_handler.notify_owner("Failed to load game commands", str(e), e)
-            logger.error(f"Failed to load game commands: {e}")
+            await self.error_handler.notify_owner(f"Failed to load {failure_label}", str(e), e)
+            logger.error("Failed to load %s: %s", failure_label, e)
             raise
+    
+    async def setup_hook(self):
+        """Setup hook called when the bot is ready."""
+        logger.info("Setting up Ritual War bot...")
         
-        try:
-            # Load admin commands cog
-            await self.load_extension('game.admin_commands')
-            logger.info("Loaded admin commands")
-        except Exception as e:
-            await self.error_handler.notify_owner("Failed to load admin commands", str(e), e)
-            logger.error(f"Failed to load admin commands: {e}")
-            # Don't raise - admin commands are optional
-        
-        try:
-            # Load daily scheduler
-            await self.load_extension('game.scheduler')
-            logger.info("Loaded daily notification scheduler")
-        except Exception as e:
-            await self.error_handler.notify_owner("Failed to load scheduler", str(e), e)
-            logger.error(f"Failed to load scheduler: {e}")
-            # Don't raise - scheduler is optional but recommended
+        # Extensions don't depend on each other, so load them concurrently.
+        # Admin commands and the scheduler are optional; game commands are required.
+        results = await asyncio.gather(
+            self._load_extension('game.commands', "game commands"),
+            self._load_extension('game.admin_commands', "admin commands"),
+            self._load_extension('game.scheduler', "daily notification scheduler", "scheduler"),
+            return_exceptions=True
+        )
+        if isinstance(results[0], BaseException):
+            raise results[0]
         
         try:
             # Sync commands
             synced = await self.tree.sync()
-            logger.info(f"Synced {len(synced)} command(s)")
+            logger.info("Synced %s command(s)", len(synced))
         except Exception as e:
             await self.error_handler.notify_owner("Failed to sync commands", str(e), e)
-            logger.error(f"Failed to sync commands: {e}")
+            logger.error("Failed to sync commands: %s", e)
     
     async def on_ready(self):
         """Called when the bot is ready."""
-        logger.info(f"Ritual War bot is ready! Logged in as {self.user}")
-        logger.info(f"Bot is in {len(self.guilds)} guild(s)")
+        logger.info("Ritual War bot is ready! Logged in as %s", self.user)
+        logger.info("Bot is in %s guild(s)", len(self.guilds))
         
         # Set bot status
         try:
@@ -121,12 +136,12 @@ class RitualWarBot(commands.Bot):
             # Send startup notification
             await self.error_handler.send_startup_notification()
         except Exception as e:
-            logger.error(f"Error in on_ready: {e}")
+            logger.error("Error in on_ready: %s", e)
     
     async def on_command_error(self, ctx, error):
         """Handle command errors."""
-        logger.error(f"Command error: {error}")
-        await self.error_handler.notify_owner("Command Error", f"Context: {ctx.command}", error)
+        logger.error("Command error: %s", error)
+        self.error_handler.enqueue_notification("Command Error", f"Context: {ctx.command}", error)
     
     async def on_app_command_error(self, interaction, error):
         """Handle application command errors."""
@@ -138,20 +153,22 @@ class RitualWarBot(commands.Bot):
             # Get the current exception
             exc_type, exc_value, exc_traceback = sys.exc_info()
             if exc_value:
-                context = {"event": event, "args": str(args)[:500]}
-                await self.error_handler.notify_owner(f"Bot Error in {event}", str(context), exc_value)
+                context = {"event": event, "args": _brief(args), "kwargs": _brief(kwargs)}
+                self.error_handler.enqueue_notification(f"Bot Error in {event}", str(context), exc_value)
             
-            logger.error(f"Bot error in event {event}", exc_info=True)
+            logger.error("Bot error in event %s", event, exc_info=True)
         except Exception as e:
-            logger.error(f"Error in error handler: {e}")
+            logger.error("Error in error handler: %s", e)
     
     async def close(self):
         """Clean shutdown."""
         logger.info("Shutting down Ritual War bot...")
         try:
+            # Deliver errors still waiting in the batch window before the connection goes away
+            await self.error_handler.flush()
             await self.error_handler.notify_owner("Bot Shutdown", "Ritual War bot is shutting down normally")
         except Exception as e:
-            logger.error(f"Error sending shutdown notification: {e}")
+            logger.error("Error sending shutdown notification: %s", e)
         await super().close()
 
 
@@ -165,7 +182,7 @@ async def main():
     except KeyboardInterrupt:
         logger.info("Received keyboard interrupt")
     except Exception as e:
-        logger.error(f"Bot crashed: {e}", exc_info=True)
+        logger.error("Bot crashed: %s", e, exc_info=True)
         # Try to send crash notification if possible
         try:
             if 'bot' in locals() and hasattr(bot, 'error_handler'):
@@ -178,11 +195,31 @@ async def main():
             await bot.close()
 
 
+def install_fast_event_loop():
+    """Use uvloop (or winloop on Windows) as the event loop policy when available."""
+    try:
+        if sys.platform == "win32":
+            import winloop as loop_impl
+        else:
+            import uvloop as loop_impl
+    except ImportError:
+        logger.info("uvloop/winloop not installed, using default asyncio event loop")
+        return
+    
+    asyncio.set_event_loop_policy(loop_impl.EventLoopPolicy())
+    logger.info("Using %s event loop", loop_impl.__name__)
+
+
 if __name__ == "__main__":
+    log_listener.start()
+    install_fast_event_loop()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
-        logger.error(f"Fatal error: {e}", exc_info=True)
+        logger.error("Fatal error: %s", e, exc_info=True)
         sys.exit(1)
+    finally:
+        # Flush any queued records before the process exits
+        log_listener.stop()
@@ -3,8 +3,10 @@
 import logging
 import traceback
 import asyncio
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Optional, Dict, Any, Callable, List, Set, Tuple
 import discord
 from discord.ext import commands
 
@@ -12,22 +14,90 @@ from discord.ext import commands
 logger = logging.getLogger(__name__)
 
 
+# Characters of field text a batched error embed may use, leaving room under Discord's
+# 6000-character embed limit for the title, description, footer and field names
+_BATCH_FIELD_TEXT_BUDGET = 4500
+
+
+def format_traceback_tail(error: Exception, limit: int = 1000) -> str:
+    """Return the last `limit` characters of an exception's traceback.
+    
+    Lines are streamed from TracebackException and only the tail is kept, so the
+    full traceback string is never built for deep stacks.
+    """
+    tail = deque()
+    size = 0
+    for chunk in traceback.TracebackException.from_exception(error).format():
+        tail.append(chunk)
+        size += len(chunk)
+        while size - len(tail[0]) >= limit:
+            size -= len(tail.popleft())
+    return ''.join(tail)[-limit:]
+
+
+class LRUDict(OrderedDict):
+    """OrderedDict that evicts its least recently written key past `maxsize` entries."""
+    
+    def __init__(self, maxsize: int = 256):
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
 class ErrorHandler:
     """Centralized error handling and notification system."""
     
+    # User-facing error embed; only the description varies per error
+    _ERROR_EMBED_TEMPLATE = {
+        "title": "❌ Command Error",
+        "description": "An error occurred while processing your command. The bot owner has been notified.",
+        "color": 0xff0000,
+    }
+    _TIMEOUT_ERROR_DESCRIPTION = "⏱️ The command took too long to process. Please try again."
+    _COOLDOWN_ERROR_TEMPLATE = "🕒 Command is on cooldown. Try again in {:.1f} seconds."
+    _PERMISSION_ERROR_DESCRIPTION = "🔒 You don't have permission to use this command."
+    
     def __init__(self, bot: commands.Bot, owner_id: int):
         self.bot = bot
         self.owner_id = owner_id
-        self.error_counts = {}
-        self.last_notification = {}
+        # Keyed by exception class name; bounded so novel error types can't grow these forever
+        self.error_counts = LRUDict(maxsize=256)
+        self.last_notification = LRUDict(maxsize=256)
         self.notification_cooldown = 300  # 5 minutes between same error types
+        self._owner: Optional[discord.User] = None
+        self.batch_window = 1.0  # seconds to collect errors into one DM
+        self._pending: List[Tuple[str, str, Optional[Exception]]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._bg_tasks: Set[asyncio.Task] = set()  # Strong refs so pending tasks aren't GC'd
+        
+        # User-facing descriptions for known error types; None falls back to the generic message
+        self._error_messages: Dict[type, Callable[[Exception], Optional[str]]] = {
+            discord.errors.NotFound: lambda e: self._TIMEOUT_ERROR_DESCRIPTION if getattr(e, 'code', None) == 10062 else None,
+            commands.CommandOnCooldown: lambda e: self._COOLDOWN_ERROR_TEMPLATE.format(e.retry_after),
+            commands.MissingPermissions: lambda _: self._PERMISSION_ERROR_DESCRIPTION,
+        }
+    
+    async def _get_owner(self) -> discord.User:
+        """Resolve the bot owner once and reuse the cached User afterwards."""
+        if self._owner is None:
+            owner = self.bot.get_user(self.owner_id)
+            if owner is None:
+                # Application info is fetched at login and usually holds the owner already
+                app = self.bot.application
+                if app and app.owner and app.owner.id == self.owner_id:
+                    owner = app.owner
+            self._owner = owner or await self.bot.fetch_user(self.owner_id)
+        return self._owner
         
     async def notify_owner(self, title: str, description: str, error: Exception = None):
         """Send a DM notification to the bot owner."""
         try:
-            owner = self.bot.get_user(self.owner_id)
-            if not owner:
-                owner = await self.bot.fetch_user(self.owner_id)
+            owner = await self._get_owner()
             
             embed = discord.Embed(
                 title=f"🚨 {title}",
@@ -44,9 +114,7 @@ class ErrorHandler:
                 )
                 
                 # Add traceback if available
-                tb = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
-                if len(tb) > 1000:
-                    tb = tb[-1000:]  # Last 1000 chars
+                tb = format_traceback_tail(error)
                 embed.add_field(
                     name="Traceback",
                     value=f"```{tb}```",
@@ -56,33 +124,123 @@ class ErrorHandler:
             embed.set_footer(text="Ritual War Bot Error Handler")
             
             await owner.send(embed=embed)
-            logger.info(f"Sent error notification to owner: {title}")
+            logger.info("Sent error notification to owner: %s", title)
+            
+        except discord.NotFound as e:
+            # Cached owner is stale (deleted account or DM channel gone) - resolve again next time
+            self._owner = None
+            logger.error("Failed to send error notification: %s", e)
+        except Exception as e:
+            logger.error("Failed to send error notification: %s", e)
+    
+    def enqueue_notification(self, title: str, description: str, error: Exception = None):
+        """Queue an owner notification; queued errors are sent together after a short window."""
+        self._pending.append((title, description, error))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after(self.batch_window))
+            self._bg_tasks.add(self._flush_task)
+            self._flush_task.add_done_callback(self._bg_tasks.discard)
+    
+    async def _flush_after(self, delay: float):
+        """Wait for the batch window to close, then send all queued notifications."""
+        await asyncio.sleep(delay)
+        pending, self._pending = self._pending, []
+        # Errors queued while this batch is being sent need a flush of their own
+        self._flush_task = None
+        await self._send_batch(pending)
+    
+    async def flush(self):
+        """Send any queued notifications now and wait for in-flight ones (used at shutdown)."""
+        if self._flush_task is not None:
+            # Still inside its batch window, so nothing has been taken from _pending yet
+            self._flush_task.cancel()
+            self._flush_task = None
+        pending, self._pending = self._pending, []
+        await self._send_batch(pending)
+        if self._bg_tasks:
+            await asyncio.gather(*self._bg_tasks, return_exceptions=True)
+    
+    async def _send_batch(self, pending: List[Tuple[str, str, Optional[Exception]]]):
+        """Send queued notifications, as one embed when there is more than one."""
+        if not pending:
+            return
+        
+        if len(pending) == 1:
+            await self.notify_owner(*pending[0])
+            return
+        
+        try:
+            owner = await self._get_owner()
+            
+            embed = discord.Embed(
+                title=f"🚨 {len(pending)} Errors",
+                description=f"{len(pending)} errors occurred within {self.batch_window:g}s",
+                color=0xff0000,
+                timestamp=datetime.utcnow()
+            )
+            
+            # Discord embeds allow at most 25 fields of 1024 characters and 6000 characters in
+            # total, so the field text budget is shared between the errors that are shown
+            shown = pending[:25]
+            field_budget = min(1024, _BATCH_FIELD_TEXT_BUDGET // len(shown))
+            for title, description, error in shown:
+                value = description[:field_budget // 3]
+                if error:
+                    value += f"\n```{str(error)[:min(300, field_budget // 3)]}```"
+                    # Whatever room is left holds the end of the traceback, where the failure is
+                    room = field_budget - len(value) - len("\n``````")
+                    if room > 0:
+                        value += f"\n```{format_traceback_tail(error, limit=room)}```"
+                embed.add_field(name=title[:256], value=value[:field_budget], inline=False)
+            
+            if len(pending) > 25:
+                embed.set_footer(text=f"Ritual War Bot Error Handler - {len(pending) - 25} more not shown")
+            else:
+                embed.set_footer(text="Ritual War Bot Error Handler")
+            
+            await owner.send(embed=embed)
+            logger.info("Sent batched error notification to owner: %s errors", len(pending))
             
+        except discord.NotFound as e:
+            self._owner = None
+            logger.error("Failed to send batched error notification: %s", e)
         except Exception as e:
-            logger.error(f"Failed to send error notification: {e}")
+            logger.error("Failed to send batched error notification: %s", e)
+    
+    def _describe_error(self, error: Exception) -> str:
+        """Pick the user-facing description for an error, exact type first then subclasses."""
+        describe = self._error_messages.get(type(error))
+        if describe is None:
+            for error_cls, fn in self._error_messages.items():
+                if isinstance(error, error_cls):
+                    describe = fn
+                    break
+        
+        description = describe(error) if describe else None
+        return description or self._ERROR_EMBED_TEMPLATE["description"]
     
     async def handle_interaction_error(self, interaction: discord.Interaction, error: Exception):
         """Handle slash command interaction errors."""
         error_type = type(error).__name__
-        now = datetime.utcnow()
+        command_name = interaction.command.name if interaction.command else "Unknown"
+        now = time.monotonic()
         
-        # Track error frequency
-        if error_type not in self.error_counts:
-            self.error_counts[error_type] = 0
-        self.error_counts[error_type] += 1
+        # Track error frequency (the write keeps hot error types resident in the LRU)
+        self.error_counts[error_type] = self.error_counts.get(error_type, 0) + 1
         
         # Check if we should send notification (cooldown)
         should_notify = (
             error_type not in self.last_notification or
-            now - self.last_notification[error_type] > timedelta(seconds=self.notification_cooldown)
+            now - self.last_notification[error_type] > self.notification_cooldown
         )
         
+        notification = None
         if should_notify:
             self.last_notification[error_type] = now
             
-            command_name = interaction.command.name if interaction.command else "Unknown"
-            user = f"{interaction.user.display_name} ({interaction.user.id})"
-            guild = f"{interaction.guild.name} ({interaction.guild.id})" if interaction.guild else "DM"
+            member, guild_obj = interaction.user, interaction.guild
+            user = f"{member.display_name} ({member.id})"
+            guild = f"{guild_obj.name} ({guild_obj.id})" if guild_obj else "DM"
             
             description = (
                 f"**Command:** /{command_name}\n"
@@ -91,24 +249,14 @@ class ErrorHandler:
                 f"**Error Count:** {self.error_counts[error_type]} (since restart)"
             )
             
-            await self.notify_owner(f"Slash Command Error: {error_type}", description, error)
+            notification = (f"Slash Command Error: {error_type}", description, error)
         
-        logger.error(f"Interaction error in {interaction.command.name if interaction.command else 'unknown'}: {error}")
+        logger.error("Interaction error in %s: %s", command_name, error)
         
         # Send user-friendly error message
         try:
-            error_embed = discord.Embed(
-                title="❌ Command Error",
-                description="An error occurred while processing your command. The bot owner has been notified.",
-                color=0xff0000
-            )
-            
-            if isinstance(error, discord.errors.NotFound) and "10062" in str(error):
-                error_embed.description = "⏱️ The command took too long to process. Please try again."
-            elif isinstance(error, commands.CommandOnCooldown):
-                error_embed.description = f"🕒 Command is on cooldown. Try again in {error.retry_after:.1f} seconds."
-            elif isinstance(error, commands.MissingPermissions):
-                error_embed.description = "🔒 You don't have permission to use this command."
+            description = self._describe_error(error)
+            error_embed = discord.Embed.from_dict({**self._ERROR_EMBED_TEMPLATE, "description": description})
             
             if not interaction.response.is_done():
                 await interaction.response.send_message(embed=error_embed, ephemeral=True)
@@ -116,12 +264,16 @@ class ErrorHandler:
                 await interaction.followup.send(embed=error_embed, ephemeral=True)
                 
         except Exception as followup_error:
-            logger.error(f"Failed to send error message to user: {followup_error}")
+            logger.error("Failed to send error message to user: %s", followup_error)
+        
+        # Owner DM goes out in the background, after the user has their reply
+        if notification:
+            self.enqueue_notification(*notification)
     
     async def send_startup_notification(self):
         """Send notification when bot starts successfully."""
         try:
-            owner = self.bot.get_user(self.owner_id) or await self.bot.fetch_user(self.owner_id)
+            owner = await self._get_owner()
             
             embed = discord.Embed(
                 title="✅ Ritual War Bot Started",
@@ -133,5 +285,8 @@ class ErrorHandler:
             await owner.send(embed=embed)
             logger.info("Sent startup notification to owner")
             
+        except discord.NotFound as e:
+            self._owner = None
+            logger.error("Failed to send startup notification: %s", e)
         except Exception as e:
-            logger.error(f"Failed to send startup notification: {e}")
+            logger.error("Failed to send startup notification: %s", e)
@@ -1,16 +1,24 @@
 """Admin commands for testing and game management."""
 
+import logging
 import os
+from typing import Optional
+
 import discord
 from discord.ext import commands
 from discord import app_commands
 from .storage import GameStorage
 from .logic import GameLogic
 from .view import GameView
-from .models import Player
 from .notifications import NotificationManager
 
 
+logger = logging.getLogger(__name__)
+
+# Parsed once at import; the extension is loaded after bot.py has read .env
+_OWNER_ID = int(os.getenv('BOT_OWNER_ID', '0'))
+
+
 class AdminCommands(commands.Cog):
     """Admin-only commands for testing and management."""
     
@@ -18,9 +26,7 @@ class AdminCommands(commands.Cog):
         self.bot = bot
         self.storage = GameStorage()
         self.notifications = NotificationManager(bot)
-        
-        # Get owner ID from environment or set a default for testing
-        self.owner_id = int(os.getenv('BOT_OWNER_ID', '0'))
+        self._app_owner_id: Optional[int] = None
     
     def _get_guild_logic(self, guild_id: str) -> GameLogic:
         """Get a GameLogic instance for the specified guild."""
@@ -31,20 +37,18 @@ class AdminCommands(commands.Cog):
         logic = self._get_guild_logic(guild_id)
         return GameView(self.storage, logic, guild_id)
     
+    async def cog_load(self):
+        """Resolve the application owner once so is_owner needs no attribute walks."""
+        # Filled in by login before setup_hook loads the extensions, so no extra REST call
+        app = self.bot.application
+        if app is None:
+            logger.warning("Application info not available yet; only BOT_OWNER_ID passes the owner check")
+            return
+        self._app_owner_id = app.owner.id if app.owner else None
+    
     def is_owner(self, user_id: int) -> bool:
-        """Check if user is the bot owner."""
-        # Check BOT_OWNER_ID from environment
-        if user_id == self.owner_id:
-            return True
-        
-        # Check if user is the Discord application owner
-        try:
-            if hasattr(self.bot.application, 'owner') and self.bot.application.owner:
-                return user_id == self.bot.application.owner.id
-        except:
-            pass
-        
-        return False
+        """Check if user is the bot owner (BOT_OWNER_ID or the Discord application owner)."""
+        return user_id == _OWNER_ID or user_id == self._app_owner_id
     
     @app_commands.command(name="admin_reset_game", description="[ADMIN] Reset the entire game state")
     async def reset_game(self, interaction: discord.Interaction):
@@ -60,6 +64,8 @@ class AdminCommands(commands.Cog):
         success = await logic.reset_game()
         
         if success:
+            # Reset wipes the guild's state table, including the public channel setting
+            self.notifications.invalidate_public_channel(guild_id)
             embed = discord.Embed(
                 title="🔄 Game Reset Complete",
                 description="All game data has been cleared. Players can now use `/join` to start a new game!",
@@ -95,14 +101,11 @@ class AdminCommands(commands.Cog):
         
         try:
             # Clear all players' last_action_day to allow new actions
-            players = await self.storage.get_active_players(guild_id)
-            for player in players:
-                player.last_action_day = None
-                await self.storage.update_player(player)
+            count = await self.storage.bulk_clear_last_action_day(guild_id)
             
             embed = discord.Embed(
                 title="📅 Day Advanced",
-                description=f"All {len(players)} players can now act again. Daily action limits have been reset.",
+                description=f"All {count} players can now act again. Daily action limits have been reset.",
                 color=0x0099ff
             )
             embed.set_footer(text="Use this to test multiple 'days' worth of actions quickly")
@@ -0,0 +1,92 @@
+"""Coalescing of bursty game actions for Ritual War."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from .config import BATCH_WINDOW_SECONDS, BATCH_MAX_WINDOW_SECONDS
+from .storage import GameStorage
+
+
+class ActionBatcher:
+    """Collects game actions that arrive close together and commits them together.
+    
+    When the guild is idle an action runs immediately. Actions that arrive while
+    another is running are queued and drained after a short window, all inside one
+    storage transaction, so a burst costs one commit instead of one per action. Each
+    action runs in its own savepoint: one that raises is undone without aborting the
+    rest of its batch. The window doubles while batches keep arriving full and resets
+    once traffic stops. All actions for a guild run one at a time, so concurrent
+    Hex/Mend calls can't overwrite each other's Doom updates.
+    """
+    
+    def __init__(self, storage: GameStorage, window: float = BATCH_WINDOW_SECONDS, max_window: float = BATCH_MAX_WINDOW_SECONDS):
+        self.storage = storage
+        self.base_window = window
+        self.max_window = max_window
+        self.window = window
+        self._lock = asyncio.Lock()
+        self._queue: List[Tuple[Callable[[], Awaitable[Any]], asyncio.Future]] = []
+        self._drain_task: Optional[asyncio.Task] = None
+    
+    async def submit(self, action: Callable[[], Awaitable[Any]]) -> Any:
+        """Run an action, batching it with others if the guild is busy."""
+        if not self._queue and not self._lock.locked():
+            async with self._lock:
+                return await action()
+        
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((action, future))
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
+        return await future
+    
+    async def _drain(self):
+        """Apply queued actions in arrival order until the queue stays empty."""
+        batch: List[Tuple[Callable[[], Awaitable[Any]], asyncio.Future]] = []
+        try:
+            while self._queue:
+                await asyncio.sleep(self.window)
+                
+                async with self._lock:
+                    batch, self._queue = self._queue, []
+                    await self._apply(batch)
+                
+                # Grow the window while the queue refills during a batch, shrink back when idle
+                if self._queue:
+                    self.window = min(self.window * 2, self.max_window)
+                else:
+                    self.window = self.base_window
+        finally:
+            # Cancelled or crashed mid-drain: nothing else will resolve these futures
+            pending, self._queue = batch + self._queue, []
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(RuntimeError("Game action was interrupted before it completed"))
+    
+    async def _apply(self, batch: List[Tuple[Callable[[], Awaitable[Any]], asyncio.Future]]):
+        """Run a batch in one transaction and resolve its futures once it has committed."""
+        outcomes: List[Tuple[asyncio.Future, Any, Optional[Exception]]] = []
+        try:
+            async with self.storage.transaction():
+                for action, future in batch:
+                    try:
+                        async with self.storage.savepoint():
+                            result = await action()
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+                    else:
+                        outcomes.append((future, result, None))
+        except Exception as e:
+            # The commit failed, so none of the batch's results stand
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -1,12 +1,83 @@
 """Discord slash commands for Ritual War."""
 
+import asyncio
+import functools
+import logging
+from typing import Awaitable, Callable, Dict, Set, Tuple
+
 import discord
 from discord.ext import commands
 from discord import app_commands
 from .storage import GameStorage
 from .logic import GameLogic
+from .models import ActionResult
 from .view import GameView
 from .notifications import NotificationManager
+from .batching import ActionBatcher
+from .config import MAX_CONCURRENT_ACTIONS, RUN_LEGACY_MIGRATION
+
+
+logger = logging.getLogger(__name__)
+
+# Static autocomplete choices for /unclaim, built once at import
+_UNCLAIM_CHOICES = [
+    app_commands.Choice(name='Hex', value='hex'),
+    app_commands.Choice(name='Mend', value='mend'),
+]
+
+# Posted to a channel when it is configured with /admin_setchannel
+_CHANNEL_CONFIGURED_EMBED = discord.Embed(
+    title="🎭 Ritual War Channel Configured",
+    description="This channel has been set for public game messages!",
+    color=0x800080
+)
+
+
+def safe_deferred_command(cmd_name: str, error_description: str):
+    """Defer a command ephemerally and turn unexpected failures into a logged error embed.
+    
+    Apply below ``@app_commands.command`` so the command still sees the original signature.
+    """
+    # Built once per command; discord.py serializes embeds at send time so reuse is safe
+    error_embed = discord.Embed(
+        title=f"❌ {cmd_name} Command Error",
+        description=error_description,
+        color=0xff0000
+    )
+    
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, interaction: discord.Interaction, *args, **kwargs):
+            # Defer response immediately to prevent timeout
+            await interaction.response.defer(ephemeral=True)
+            
+            try:
+                await func(self, interaction, *args, **kwargs)
+                
+            except discord.errors.NotFound:
+                # Interaction expired/invalid - the action may still have been applied, just log it
+                logger.warning("%s command interaction expired for user %s", cmd_name, interaction.user.id)
+                
+            except discord.errors.HTTPException as http_e:
+                # Handle HTTP exceptions (like already acknowledged)
+                logger.warning("%s command HTTP error for user %s: %s", cmd_name, interaction.user.id, http_e)
+                
+            except Exception as e:
+                event = {"event": f"{cmd_name.lower()}_failed", "user_id": interaction.user.id, "reason": type(e).__name__}
+                logger.error("Command %s failed: %s", cmd_name, e, extra=event)
+                
+                try:
+                    # Pick the send path from the interaction state rather than guessing
+                    if interaction.response.is_done():
+                        await interaction.followup.send(embed=error_embed, ephemeral=True)
+                    else:
+                        await interaction.response.send_message(embed=error_embed, ephemeral=True)
+                except Exception:
+                    # If we can't even send the error message, just log it
+                    logger.error("Could not send error message to user %s", interaction.user.id)
+        
+        return wrapper
+    return decorator
 
 
 class RitualWarCommands(commands.Cog):
@@ -16,248 +87,212 @@ class RitualWarCommands(commands.Cog):
         self.bot = bot
         self.storage = GameStorage()
         self.notifications = NotificationManager(bot)
+        
+        # The cog is a per-process singleton, and GameLogic/GameView keep no
+        # per-call state, so one instance per guild is shared by all commands
+        self._logic_cache: Dict[str, GameLogic] = {}
+        self._view_cache: Dict[str, GameView] = {}
+        self._guild_sems: Dict[str, asyncio.Semaphore] = {}
+        self._batchers: Dict[str, ActionBatcher] = {}
+        self._migrated: Set[str] = set()
+        self._bg_tasks: Set[asyncio.Task] = set()  # Strong refs to in-flight broadcasts
     
     async def cog_load(self):
-        """Initialize the database when the cog loads."""
+        """Initialize and warm up the database when the cog loads."""
         await self.storage.initialize()
+        await self.storage.warm_up()
+    
+    async def cog_unload(self):
+        """Close the shared database connection pool."""
+        await self.storage.close()
     
     def _get_guild_logic(self, guild_id: str) -> GameLogic:
-        """Get a GameLogic instance for the specified guild."""
-        return GameLogic(self.storage, guild_id)
+        """Get the GameLogic instance for the specified guild, creating it on first use."""
+        logic = self._logic_cache.get(guild_id)
+        if logic is None:
+            logic = self._logic_cache[guild_id] = GameLogic(self.storage, guild_id)
+        return logic
     
     def _get_guild_view(self, guild_id: str) -> GameView:
-        """Get a GameView instance for the specified guild."""
-        logic = self._get_guild_logic(guild_id)
-        return GameView(self.storage, logic, guild_id)
+        """Get the GameView instance for the specified guild, creating it on first use."""
+        view = self._view_cache.get(guild_id)
+        if view is None:
+            view = self._view_cache[guild_id] = GameView(self.storage, self._get_guild_logic(guild_id), guild_id)
+        return view
     
-    @app_commands.command(name="join", description="Join the Ritual War")
-    async def join(self, interaction: discord.Interaction):
-        """Join the game."""
+    def _get_guild_semaphore(self, guild_id: str) -> asyncio.Semaphore:
+        """Get the semaphore bounding concurrent game actions in a guild."""
+        sem = self._guild_sems.get(guild_id)
+        if sem is None:
+            sem = self._guild_sems[guild_id] = asyncio.Semaphore(MAX_CONCURRENT_ACTIONS)
+        return sem
+    
+    def _get_guild_batcher(self, guild_id: str) -> ActionBatcher:
+        """Get the batcher that coalesces Hex/Mend/claim actions in a guild."""
+        batcher = self._batchers.get(guild_id)
+        if batcher is None:
+            batcher = self._batchers[guild_id] = ActionBatcher(self.storage)
+        return batcher
+    
+    @staticmethod
+    def _ctx(interaction: discord.Interaction) -> Tuple[str, str]:
+        """Return the (guild_id, user_id) storage keys for an interaction."""
         guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
-        logic = self._get_guild_logic(guild_id)
-        view = self._get_guild_view(guild_id)
+        return guild_id, str(interaction.user.id)
+    
+    def _spawn(self, coro: Awaitable, description: str):
+        """Run a coroutine in the background, keeping a reference and logging any failure."""
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
         
-        # Migrate legacy data if needed for this guild
-        await self.storage.migrate_legacy_data(guild_id)
+        def _done(t: asyncio.Task):
+            self._bg_tasks.discard(t)
+            if not t.cancelled() and t.exception():
+                logger.warning("Failed to send %s: %s", description, t.exception())
         
-        result = await logic.join_game(str(interaction.user.id))
+        task.add_done_callback(_done)
+    
+    async def _broadcast(self, interaction: discord.Interaction, result: ActionResult):
+        """Post an action's public message, followed by the victory announcement if it ended the game."""
+        delivered = await self.notifications.send_public_message(interaction, content=result.public_message)
         
-        if result.success:
-            await interaction.response.send_message(result.message, ephemeral=True)
-            if result.public_message:
-                await self.notifications.send_public_message(interaction, content=result.public_message)
-        else:
-            embed = view.format_error(result.message)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+        # If someone won, trigger XP reward (skipped if no public channel could be reached at all)
+        if result.winner_id and delivered:
+            member = interaction.guild.get_member(int(result.winner_id)) if interaction.guild else None
+            winner_name = member.display_name if member else "Unknown"
+            await self.notifications.send_victory_announcement(interaction, result.winner_id, winner_name)
     
-    @app_commands.command(name="leave", description="Leave the Ritual War")
-    async def leave(self, interaction: discord.Interaction):
-        """Leave the game."""
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
+    async def _submit(self, guild_id: str, call: Callable[[], Awaitable[ActionResult]], batch: bool = False) -> ActionResult:
+        """Run a game action under the guild's concurrency cap, through its batcher if `batch` is set."""
+        async with self._get_guild_semaphore(guild_id):
+            if batch:
+                return await self._get_guild_batcher(guild_id).submit(call)
+            return await call()
+    
+    async def _run(
+        self,
+        interaction: discord.Interaction,
+        action: Callable[[GameLogic, str], Awaitable[ActionResult]],
+        batch: bool = False
+    ) -> ActionResult:
+        """Defer the interaction, run a game action, and report the result via followups.
+        
+        Deferring first gives us Discord's 15 minute followup window instead of the
+        3 second initial response deadline, so slow database work can't expire the interaction.
+        """
+        await interaction.response.defer(ephemeral=True)
+        
+        guild_id, user_id = self._ctx(interaction)
         logic = self._get_guild_logic(guild_id)
-        view = self._get_guild_view(guild_id)
         
-        result = await logic.leave_game(str(interaction.user.id))
+        # Already deferred, so commands queued behind the semaphore can't hit the 3s deadline
+        result = await self._submit(guild_id, lambda: action(logic, user_id), batch)
         
         if result.success:
-            await interaction.response.send_message(result.message, ephemeral=True)
+            await interaction.followup.send(result.message, ephemeral=True)
+            # The caster only waits for their private reply; public posts go out in the background
             if result.public_message:
-                await self.notifications.send_public_message(interaction, content=result.public_message)
+                self._spawn(self._broadcast(interaction, result), f"public message for user {user_id}")
         else:
-            embed = view.format_error(result.message)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            embed = self._get_guild_view(guild_id).format_error(result.message)
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        
+        return result
+    
+    @app_commands.command(name="join", description="Join the Ritual War")
+    async def join(self, interaction: discord.Interaction):
+        """Join the game."""
+        async def action(logic: GameLogic, user_id: str) -> ActionResult:
+            # Migrate legacy data if needed for this guild (once per process, and only when enabled)
+            if RUN_LEGACY_MIGRATION and logic.guild_id not in self._migrated:
+                await self.storage.migrate_legacy_data(logic.guild_id)
+                self._migrated.add(logic.guild_id)
+            return await logic.join_game(user_id)
+        
+        await self._run(interaction, action)
+    
+    @app_commands.command(name="leave", description="Leave the Ritual War")
+    async def leave(self, interaction: discord.Interaction):
+        """Leave the game."""
+        await self._run(interaction, lambda logic, user_id: logic.leave_game(user_id))
     
     @app_commands.command(name="hex", description="Cast Hex on a target")
     @app_commands.describe(target="The player to hex")
-    async def hex(self, interaction: discord.Interaction, target: discord.Member):
+    async def hex(self, interaction: discord.Interaction, target: discord.User):
         """Cast Hex on a target."""
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
-        logic = self._get_guild_logic(guild_id)
-        view = self._get_guild_view(guild_id)
-        
-        result = await logic.hex_target(str(interaction.user.id), str(target.id))
-        
-        if result.success:
-            await interaction.response.send_message(result.message, ephemeral=True)
-            if result.public_message:
-                await self.notifications.send_public_message(interaction, content=result.public_message)
-                
-                # If someone won, trigger XP reward
-                if result.winner_id:
-                    winner_name = target.display_name if result.winner_id == str(target.id) else "Unknown"
-                    await self.notifications.send_victory_announcement(interaction, result.winner_id, winner_name)
-        else:
-            embed = view.format_error(result.message)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+        await self._run(interaction, lambda logic, user_id: logic.hex_target(user_id, str(target.id)), batch=True)
     
     @app_commands.command(name="shield", description="Cast Shield to protect yourself")
+    @safe_deferred_command("Shield", "An error occurred while casting Shield. Please try again.")
     async def shield(self, interaction: discord.Interaction):
         """Cast Shield on self."""
-        # Defer response immediately to prevent timeout
-        await interaction.response.defer(ephemeral=True)
-        
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
-        logic = self._get_guild_logic(guild_id)
-        view = self._get_guild_view(guild_id)
-        
-        try:
-            result = await logic.shield_self(str(interaction.user.id))
-            
-            if result.success:
-                # Send the private response first
-                await interaction.followup.send(result.message, ephemeral=True)
-                
-                # Send public message separately, with error handling
-                if result.public_message:
-                    try:
-                        await self.notifications.send_public_message(interaction, content=result.public_message)
-                    except Exception as pub_e:
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.warning(f"Failed to send public shield message for user {interaction.user.id}: {pub_e}")
-            else:
-                embed = view.format_error(result.message)
-                await interaction.followup.send(embed=embed, ephemeral=True)
-                
-        except discord.errors.NotFound:
-            # Interaction expired/invalid - shield was likely still applied, just log it
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Shield command interaction expired for user {interaction.user.id}, but shield may have been applied")
-            
-        except discord.errors.HTTPException as http_e:
-            # Handle HTTP exceptions (like already acknowledged)
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Shield command HTTP error for user {interaction.user.id}: {http_e}")
-            
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Shield command error for user {interaction.user.id}: {e}")
-            
-            try:
-                error_embed = discord.Embed(
-                    title="❌ Shield Command Error",
-                    description="An error occurred while casting Shield. Please try again.",
-                    color=0xff0000
-                )
-                await interaction.followup.send(embed=error_embed, ephemeral=True)
-            except:
-                # If we can't even send the error message, just log it
-                logger.error(f"Could not send error message to user {interaction.user.id}")
-
-    @app_commands.command(name="mend", description="Cast Mend to heal a target")
-    @app_commands.describe(target="The player to mend")
-    async def mend(self, interaction: discord.Interaction, target: discord.Member):
-        """Cast Mend on a target."""
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
+        guild_id, user_id = self._ctx(interaction)
         logic = self._get_guild_logic(guild_id)
         view = self._get_guild_view(guild_id)
         
-        result = await logic.mend_target(str(interaction.user.id), str(target.id))
+        result = await self._submit(guild_id, lambda: logic.shield_self(user_id), batch=True)
         
         if result.success:
-            await interaction.response.send_message(result.message, ephemeral=True)
+            # Send the private response first
+            await interaction.followup.send(result.message, ephemeral=True)
+            
+            # Send public message in the background; failures are logged by _spawn
             if result.public_message:
-                await self.notifications.send_public_message(interaction, content=result.public_message)
+                self._spawn(self._broadcast(interaction, result), f"public shield message for user {user_id}")
         else:
             embed = view.format_error(result.message)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await interaction.followup.send(embed=embed, ephemeral=True)
+    
+    @app_commands.command(name="mend", description="Cast Mend to heal a target")
+    @app_commands.describe(target="The player to mend")
+    async def mend(self, interaction: discord.Interaction, target: discord.User):
+        """Cast Mend on a target."""
+        await self._run(interaction, lambda logic, user_id: logic.mend_target(user_id, str(target.id)), batch=True)
     
     @app_commands.command(name="inspect", description="Inspect a player's status")
     @app_commands.describe(player="The player to inspect (leave empty for self)")
-    async def inspect(self, interaction: discord.Interaction, player: discord.Member = None):
+    @safe_deferred_command("Inspect", "An error occurred while inspecting. Please try again.")
+    async def inspect(self, interaction: discord.Interaction, player: discord.User = None):
         """Inspect a player's status."""
-        # Defer response immediately to prevent timeout
-        await interaction.response.defer(ephemeral=True)
-        
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
+        guild_id, user_id = self._ctx(interaction)
         view = self._get_guild_view(guild_id)
         
-        try:
-            target_id = str(player.id) if player else str(interaction.user.id)
-            
-            embed = await view.format_inspect(
-                str(interaction.user.id), 
-                target_id, 
-                interaction.guild
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            
-        except discord.errors.NotFound:
-            # Interaction expired/invalid - just log it
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Inspect command interaction expired for user {interaction.user.id}")
-            
-        except discord.errors.HTTPException as http_e:
-            # Handle HTTP exceptions (like already acknowledged)
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Inspect command HTTP error for user {interaction.user.id}: {http_e}")
-            
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Inspect command error for user {interaction.user.id}: {e}")
-            
-            try:
-                error_embed = discord.Embed(
-                    title="❌ Inspect Command Error",
-                    description="An error occurred while inspecting. Please try again.",
-                    color=0xff0000
-                )
-                await interaction.followup.send(embed=error_embed, ephemeral=True)
-            except:
-                # If we can't even send the error message, just log it
-                logger.error(f"Could not send error message to user {interaction.user.id}")
-
+        target_id = str(player.id) if player else user_id
+        
+        embed = await view.format_inspect(
+            user_id, 
+            target_id, 
+            interaction.guild
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
     
     @app_commands.command(name="leaderboard", description="View the current game state")
     async def leaderboard(self, interaction: discord.Interaction):
         """Display the leaderboard."""
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
+        # Leaderboard is posted publicly, so the deferred response is not ephemeral
+        await interaction.response.defer()
+        
+        guild_id, _ = self._ctx(interaction)
         view = self._get_guild_view(guild_id)
         
         embed = await view.format_leaderboard(interaction.guild)
-        await interaction.response.send_message(embed=embed)
+        await interaction.followup.send(embed=embed)
+    
+    async def _claim(self, interaction: discord.Interaction, target: discord.User, claim_type: str):
+        """Shared body of /claimhex and /claimmend."""
+        await self._run(interaction, lambda logic, user_id: logic.claim_signature(user_id, str(target.id), claim_type), batch=True)
     
     @app_commands.command(name="claimhex", description="Publicly claim you hexed a player")
     @app_commands.describe(target="The player you claim to have hexed")
-    async def claimhex(self, interaction: discord.Interaction, target: discord.Member):
+    async def claimhex(self, interaction: discord.Interaction, target: discord.User):
         """Claim to have hexed a player."""
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
-        logic = self._get_guild_logic(guild_id)
-        view = self._get_guild_view(guild_id)
-        
-        result = await logic.claim_signature(str(interaction.user.id), str(target.id), "hex")
-        
-        if result.success:
-            await interaction.response.send_message(result.message, ephemeral=True)
-            if result.public_message:
-                await self.notifications.send_public_message(interaction, content=result.public_message)
-        else:
-            embed = view.format_error(result.message)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+        await self._claim(interaction, target, "hex")
     
     @app_commands.command(name="claimmend", description="Publicly claim you mended a player")
     @app_commands.describe(target="The player you claim to have mended")
-    async def claimmend(self, interaction: discord.Interaction, target: discord.Member):
+    async def claimmend(self, interaction: discord.Interaction, target: discord.User):
         """Claim to have mended a player."""
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
-        logic = self._get_guild_logic(guild_id)
-        view = self._get_guild_view(guild_id)
-        
-        result = await logic.claim_signature(str(interaction.user.id), str(target.id), "mend")
-        
-        if result.success:
-            await interaction.response.send_message(result.message, ephemeral=True)
-            if result.public_message:
-                await self.notifications.send_public_message(interaction, content=result.public_message)
-        else:
-            embed = view.format_error(result.message)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+        await self._claim(interaction, target, "mend")
     
     @app_commands.command(name="unclaim", description="Remove a public claim")
     @app_commands.describe(
@@ -267,18 +302,18 @@ class RitualWarCommands(commands.Cog):
     async def unclaim(
         self, 
         interaction: discord.Interaction, 
-        target: discord.Member,
+        target: discord.User,
         action: str
     ):
         """Remove a public claim."""
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
+        await interaction.response.defer(ephemeral=True)
+        
+        guild_id, user_id = self._ctx(interaction)
         logic = self._get_guild_logic(guild_id)
         view = self._get_guild_view(guild_id)
         
-        result = await logic.unclaim_signature(
-            str(interaction.user.id), 
-            str(target.id), 
-            action
+        result = await self._submit(
+            guild_id, lambda: logic.unclaim_signature(user_id, str(target.id), action), batch=True
         )
         
         if result.success:
@@ -286,7 +321,7 @@ class RitualWarCommands(commands.Cog):
         else:
             embed = view.format_error(result.message)
         
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await interaction.followup.send(embed=embed, ephemeral=True)
     
     @unclaim.autocomplete('action')
     async def unclaim_action_autocomplete(
@@ -295,29 +330,29 @@ class RitualWarCommands(commands.Cog):
         current: str,
     ) -> list[app_commands.Choice[str]]:
         """Provide choices for unclaim action."""
-        return [
-            app_commands.Choice(name='Hex', value='hex'),
-            app_commands.Choice(name='Mend', value='mend'),
-        ]
+        current = current.lower()
+        return [choice for choice in _UNCLAIM_CHOICES if current in choice.name.lower()]
     
     @app_commands.command(name="admin_setchannel", description="[ADMIN] Set the channel for public game messages")
     @app_commands.describe(channel="The channel where public game messages should be sent")
     async def set_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
         """Set the channel for public game messages."""
+        await interaction.response.defer(ephemeral=True)
+        
         # Check if user has administrator permissions
         if not interaction.user.guild_permissions.administrator:
-            await interaction.response.send_message("❌ Only server administrators can set the game channel.", ephemeral=True)
+            await interaction.followup.send("❌ Only server administrators can set the game channel.", ephemeral=True)
             return
         
-        guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
+        guild_id, _ = self._ctx(interaction)
         
         # Check if bot can send messages in the specified channel
         if not channel.permissions_for(interaction.guild.me).send_messages:
-            await interaction.response.send_message(f"❌ I don't have permission to send messages in {channel.mention}.", ephemeral=True)
+            await interaction.followup.send(f"❌ I don't have permission to send messages in {channel.mention}.", ephemeral=True)
             return
         
         # Store the channel preference in the database
-        await self.storage.set_state(f"public_channel", str(channel.id), guild_id)
+        await self.notifications.set_public_channel(guild_id, channel.id)
         
         embed = discord.Embed(
             title="✅ Channel Set Successfully",
@@ -330,16 +365,11 @@ class RitualWarCommands(commands.Cog):
             inline=False
         )
         
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await interaction.followup.send(embed=embed, ephemeral=True)
         
         # Send a test message to the configured channel
         try:
-            test_embed = discord.Embed(
-                title="🎭 Ritual War Channel Configured",
-                description="This channel has been set for public game messages!",
-                color=0x800080
-            )
-            await channel.send(embed=test_embed)
+            await channel.send(embed=_CHANNEL_CONFIGURED_EMBED)
         except Exception as e:
             await interaction.followup.send(f"⚠️ Channel set but failed to send test message: {e}", ephemeral=True)
 
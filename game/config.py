@@ -1,19 +1,55 @@
 """Game configuration constants and settings."""
 
-THRESHOLD = 12
-SHIELD_CLEANSE = 2
-SIGNATURE_TTL_HOURS = 24
-VEIL_REDUCTION = 0.5
-TIMEZONE = "America/Los_Angeles"
+from typing import Final, Tuple
 
-FRESH_BUCKETS = [
+THRESHOLD: Final[int] = 12
+SHIELD_CLEANSE: Final[int] = 2
+SIGNATURE_TTL_HOURS: Final[int] = 24
+VEIL_REDUCTION: Final[float] = 0.5
+TIMEZONE: Final[str] = "America/Los_Angeles"
+
+FRESH_BUCKETS: Final[Tuple[Tuple[int, int, str], ...]] = (
     (0, 6, "Fresh"),
-    (6, 18, "Warm"), 
-    (18, 24, "Cooling")
-]
+    (6, 18, "Warm"),
+    (18, 24, "Cooling"),
+)
+
+DATABASE_PATH: Final[str] = "ritual_war.db"
+
+# Set to True for one start to upgrade a database created before multi-guild support;
+# fresh deployments skip the legacy checks entirely
+RUN_LEGACY_MIGRATION: Final[bool] = False
+
+# Long-lived read-only SQLite connections kept open for reuse across commands; writes go
+# through one separate writer connection
+DB_POOL_SIZE: Final[int] = 4
+
+# Compiled SQL statements kept per connection (sqlite3's default is 128)
+STATEMENT_CACHE_SIZE: Final[int] = 256
+
+# How long a user's Hex/Mend lockouts are reused before being read again
+LOCKOUT_CACHE_SECONDS: Final[int] = 5
+
+# Max game actions running at once per guild; extra commands wait (they are already deferred)
+MAX_CONCURRENT_ACTIONS: Final[int] = 4
+
+# Hex/Mend/claim actions arriving within this window are applied as one batch
+BATCH_WINDOW_SECONDS: Final[float] = 0.025
+BATCH_MAX_WINDOW_SECONDS: Final[float] = 0.2
+
+# How often expired signatures and claims are deleted (reads already ignore them)
+PURGE_INTERVAL_SECONDS: Final[int] = 300
+
+# How often the database file is compacted with VACUUM (weekly)
+VACUUM_INTERVAL_SECONDS: Final[int] = 7 * 24 * 3600
+
+# Hour (game timezone) when daily reminders go out
+REMINDER_HOUR: Final[int] = 8
 
-DATABASE_PATH = "ritual_war.db"
+# Daily reminder DMs in flight at once, and the pause each sender takes after a DM
+REMINDER_CONCURRENCY: Final[int] = 10
+REMINDER_DELAY_SECONDS: Final[float] = 0.1
 
 # Channel configuration
-RITUAL_WAR_CHANNEL_ID = 1409497777775448074  # Only public messages go here
-XP_REWARD_AMOUNT = 100  # XP to award for victory
\ No newline at end of file
+RITUAL_WAR_CHANNEL_ID: Final[int] = 1409497777775448074  # Only public messages go here
+XP_REWARD_AMOUNT: Final[int] = 100  # XP to award for victory
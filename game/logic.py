@@ -1,10 +1,11 @@
 """Core game logic for Ritual War."""
 
+import asyncio
 import math
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 from .models import Player, Signature, ActionResult, TrainStatus
-from .storage import GameStorage
-from .timeutils import now, today_key, timestamp_from_hours, hours_since, get_freshness_bucket, hours_until
+from .storage import GameStorage, transactional
+from .timeutils import now_timestamp, today_key, get_freshness_bucket
 from .config import THRESHOLD, SHIELD_CLEANSE, SIGNATURE_TTL_HOURS, VEIL_REDUCTION
 
 
@@ -21,6 +22,7 @@ class GameLogic:
             return False, "The roster is locked. No new players can join after the first elimination."
         return True, ""
     
+    @transactional
     async def join_game(self, user_id: str) -> ActionResult:
         """Have a player join the game."""
         existing = await self.storage.get_player(user_id, self.guild_id)
@@ -46,6 +48,7 @@ class GameLogic:
             f"<@{user_id}> has joined the Ritual War!"
         )
     
+    @transactional
     async def leave_game(self, user_id: str) -> ActionResult:
         """Have a player leave the game."""
         player = await self.storage.get_player(user_id, self.guild_id)
@@ -54,8 +57,7 @@ class GameLogic:
         
         player.active = 0
         await self.storage.update_player(player)
-        await self.storage.clear_signatures(user_id, self.guild_id)
-        await self.storage.clear_claims(user_id, self.guild_id)
+        await self.storage.clear_user_artifacts(user_id, self.guild_id)
         
         return ActionResult(
             True,
@@ -63,23 +65,53 @@ class GameLogic:
             f"<@{user_id}> has left the Ritual War!"
         )
     
-    async def get_train_status(self, target_id: str, sig_type: str) -> TrainStatus:
-        """Get the status of a signature train on a target."""
-        signatures = await self.storage.get_signatures(target_id, sig_type, self.guild_id)
-        count = len(signatures)
-        
+    async def get_trains(self, target_id: str, now_ts: Optional[int] = None) -> Tuple[TrainStatus, TrainStatus]:
+        """Get the Hex and Mend trains on a target from a single query."""
+        if now_ts is None:
+            now_ts = now_timestamp()
+        signatures = await self.storage.get_all_signatures_for_target(target_id, self.guild_id, now_ts)
+        
+        hex_expiries = [sig.expires_at for sig in signatures if sig.type == "hex"]
+        mend_expiries = [sig.expires_at for sig in signatures if sig.type == "mend"]
+        return (
+            self._train_from(len(hex_expiries), max(hex_expiries, default=None), now_ts),
+            self._train_from(len(mend_expiries), max(mend_expiries, default=None), now_ts),
+        )
+    
+    async def get_guild_trains(self, now_ts: Optional[int] = None) -> Dict[str, Tuple[TrainStatus, TrainStatus]]:
+        """Get the Hex and Mend trains on every target in the guild from a single query.
+        
+        Targets without live signatures are left out; callers treat them as having empty trains.
+        """
+        if now_ts is None:
+            now_ts = now_timestamp()
+        counts = await self.storage.get_train_counts(self.guild_id, now_ts)
+        
+        trains: Dict[str, Tuple[TrainStatus, TrainStatus]] = {}
+        for target_id in {target_id for target_id, _ in counts}:
+            hex_count, hex_latest = counts.get((target_id, "hex"), (0, None))
+            mend_count, mend_latest = counts.get((target_id, "mend"), (0, None))
+            trains[target_id] = (
+                self._train_from(hex_count, hex_latest, now_ts),
+                self._train_from(mend_count, mend_latest, now_ts),
+            )
+        return trains
+    
+    @staticmethod
+    def _train_from(count: int, latest_expires_at: Optional[int], now_ts: int) -> TrainStatus:
+        """Build a train status from its live signature count and latest expiry."""
         if count == 0:
             return TrainStatus(0, "Expired")
         
-        # Get oldest signature to determine freshness
-        oldest_hours = min(hours_since(sig.expires_at - SIGNATURE_TTL_HOURS * 3600) for sig in signatures)
-        freshness = get_freshness_bucket(oldest_hours)
+        # Freshness follows the most recent signature on the train
+        freshness = get_freshness_bucket((now_ts - (latest_expires_at - SIGNATURE_TTL_HOURS * 3600)) / 3600)
         
         return TrainStatus(count, freshness)
     
-    async def can_act_today(self, user_id: str, bypass_daily_limit: bool = False) -> Tuple[bool, str]:
-        """Check if a player can act today."""
-        player = await self.storage.get_player(user_id, self.guild_id)
+    async def can_act_today(self, user_id: str, bypass_daily_limit: bool = False, player: Optional[Player] = None, today: Optional[str] = None) -> Tuple[bool, str]:
+        """Check if a player can act today. Pass `player` and `today` if the caller already has them."""
+        if player is None:
+            player = await self.storage.get_player(user_id, self.guild_id)
         if not player or not player.active:
             return False, "You are not in the game."
         
@@ -87,19 +119,24 @@ class GameLogic:
         if bypass_daily_limit:
             return True, ""
         
-        today = today_key()
-        if player.last_action_day == today:
+        if player.last_action_day == (today or today_key()):
             return False, "You have already acted today. Wait until tomorrow to act again."
         
         return True, ""
     
+    @transactional
     async def hex_target(self, actor_id: str, target_id: str, bypass_daily_limit: bool = False) -> ActionResult:
         """Execute a Hex action."""
+        now_ts = now_timestamp()
+        today = today_key()
+        
         if actor_id == target_id:
             return ActionResult(False, "You cannot target yourself with Hex.")
         
-        actor = await self.storage.get_player(actor_id, self.guild_id)
-        target = await self.storage.get_player(target_id, self.guild_id)
+        actor, target = await asyncio.gather(
+            self.storage.get_player(actor_id, self.guild_id),
+            self.storage.get_player(target_id, self.guild_id),
+        )
         
         if not actor or not actor.active:
             return ActionResult(False, "You are not in the game.")
@@ -107,16 +144,23 @@ class GameLogic:
         if not target or not target.active:
             return ActionResult(False, "Target is not in the game.")
         
-        can_act, reason = await self.can_act_today(actor_id, bypass_daily_limit)
+        can_act, reason = await self.can_act_today(actor_id, bypass_daily_limit, player=actor, today=today)
         if not can_act:
             return ActionResult(False, reason)
         
-        if await self.storage.has_signature(target_id, actor_id, "hex", self.guild_id):
-            return ActionResult(False, "You already have an active Hex signature on this target.")
-        
         # Get current mark status
-        hex_train = await self.get_train_status(target_id, "hex")
-        mend_train = await self.get_train_status(target_id, "mend")
+        hex_train, mend_train = await self.get_trains(target_id, now_ts)
+        
+        # Add the Hex signature up front; a live one from this actor doubles as the duplicate check
+        hex_signature = Signature(
+            target_id=target_id,
+            signer_id=actor_id,
+            guild_id=self.guild_id,
+            type="hex",
+            expires_at=now_ts + SIGNATURE_TTL_HOURS * 3600
+        )
+        if not await self.storage.add_signature(hex_signature, now_ts):
+            return ActionResult(False, "You already have an active Hex signature on this target.")
         
         # Calculate raw damage
         raw_damage = 1 + hex_train.count
@@ -124,18 +168,17 @@ class GameLogic:
         # Check if target would be eliminated and needs Reflex Shield
         reflex_shield_triggered = False
         if target.doom + raw_damage >= THRESHOLD:
-            target_can_act, _ = await self.can_act_today(target_id)
+            target_can_act, _ = await self.can_act_today(target_id, player=target, today=today)
             if target_can_act:
                 # Trigger Reflex Shield
                 reflex_shield_triggered = True
                 target.doom = max(0, target.doom - SHIELD_CLEANSE)
-                target.veil_until = timestamp_from_hours(SIGNATURE_TTL_HOURS)
-                target.last_action_day = today_key()
-                await self.storage.update_player(target)
+                target.veil_until = now_ts + SIGNATURE_TTL_HOURS * 3600
+                target.last_action_day = today
         
         # Calculate final damage with Veil
         final_damage = raw_damage
-        veil_active = target.veil_until and target.veil_until > int(now().timestamp())
+        veil_active = target.veil_until and target.veil_until > now_ts
         if veil_active:
             final_damage = math.floor(raw_damage * VEIL_REDUCTION)
         
@@ -149,24 +192,12 @@ class GameLogic:
             if not await self.storage.is_roster_locked(self.guild_id):
                 await self.storage.lock_roster(self.guild_id)
         
-        await self.storage.update_player(target)
+        # Mark actor as having acted today; target and actor are written together
+        actor.last_action_day = today
+        await self.storage.update_players_bulk([target, actor])
         
-        # Mark actor as having acted today
-        actor.last_action_day = today_key()
-        await self.storage.update_player(actor)
-        
-        # Add/refresh Hex signature
-        hex_signature = Signature(
-            target_id=target_id,
-            signer_id=actor_id,
-            guild_id=self.guild_id,
-            type="hex",
-            expires_at=timestamp_from_hours(SIGNATURE_TTL_HOURS)
-        )
-        await self.storage.add_signature(hex_signature)
-        
-        # Update train counts after adding signature
-        hex_train_after = await self.get_train_status(target_id, "hex")
+        # The new signature extends the train by one and is the freshest mark on it
+        hex_train_after = TrainStatus(hex_train.count + 1, get_freshness_bucket(0))
         
         # Check if game ended after this elimination
         winner_id = await self.check_game_end()
@@ -196,36 +227,38 @@ class GameLogic:
             if winner_id:
                 public_msg += f"\n\n🎉 **RITUAL WAR COMPLETE!** 🎉\n<@{winner_id}> is the last Mage standing and wins the game!"
         
-        result = ActionResult(
+        return ActionResult(
             True,
             ephemeral_msg,
             public_msg,
             doom_change=final_damage,
             new_doom=target.doom,
             eliminated=eliminated,
-            reflex_shield_triggered=reflex_shield_triggered
+            reflex_shield_triggered=reflex_shield_triggered,
+            winner_id=winner_id
         )
-        result.winner_id = winner_id  # Add winner info to result
-        
-        return result
     
+    @transactional
     async def shield_self(self, user_id: str, bypass_daily_limit: bool = False) -> ActionResult:
         """Execute a Shield action."""
+        now_ts = now_timestamp()
+        today = today_key()
+        
         player = await self.storage.get_player(user_id, self.guild_id)
         if not player or not player.active:
             return ActionResult(False, "You are not in the game.")
         
-        can_act, reason = await self.can_act_today(user_id, bypass_daily_limit)
+        can_act, reason = await self.can_act_today(user_id, bypass_daily_limit, player=player, today=today)
         if not can_act:
             return ActionResult(False, reason)
         
         # Apply Shield effects
         old_doom = player.doom
         player.doom = max(0, player.doom - SHIELD_CLEANSE)
-        player.veil_until = timestamp_from_hours(SIGNATURE_TTL_HOURS)
-        player.last_action_day = today_key()
+        player.veil_until = now_ts + SIGNATURE_TTL_HOURS * 3600
+        player.last_action_day = today
         
-        await self.storage.update_player(player)
+        player = await self.storage.update_player(player)
         
         doom_healed = old_doom - player.doom
         
@@ -240,10 +273,16 @@ class GameLogic:
             new_doom=player.doom
         )
     
+    @transactional
     async def mend_target(self, actor_id: str, target_id: str, bypass_daily_limit: bool = False) -> ActionResult:
         """Execute a Mend action."""
-        actor = await self.storage.get_player(actor_id, self.guild_id)
-        target = await self.storage.get_player(target_id, self.guild_id)
+        now_ts = now_timestamp()
+        today = today_key()
+        
+        actor, target = await asyncio.gather(
+            self.storage.get_player(actor_id, self.guild_id),
+            self.storage.get_player(target_id, self.guild_id),
+        )
         
         if not actor or not actor.active:
             return ActionResult(False, "You are not in the game.")
@@ -251,41 +290,36 @@ class GameLogic:
         if not target or not target.active:
             return ActionResult(False, "Target is not in the game.")
         
-        can_act, reason = await self.can_act_today(actor_id, bypass_daily_limit)
+        can_act, reason = await self.can_act_today(actor_id, bypass_daily_limit, player=actor, today=today)
         if not can_act:
             return ActionResult(False, reason)
         
-        if await self.storage.has_signature(target_id, actor_id, "mend", self.guild_id):
-            return ActionResult(False, "You already have an active Mend signature on this target.")
-        
         # Get current mark status
-        hex_train = await self.get_train_status(target_id, "hex")
-        mend_train = await self.get_train_status(target_id, "mend")
-        
-        # Calculate healing
-        healing = 1 + mend_train.count
-        old_doom = target.doom
-        target.doom = max(0, target.doom - healing)
-        actual_healing = old_doom - target.doom
-        
-        await self.storage.update_player(target)
-        
-        # Mark actor as having acted today
-        actor.last_action_day = today_key()
-        await self.storage.update_player(actor)
+        hex_train, mend_train = await self.get_trains(target_id, now_ts)
         
-        # Add/refresh Mend signature
+        # Add the Mend signature up front; a live one from this actor doubles as the duplicate check
         mend_signature = Signature(
             target_id=target_id,
             signer_id=actor_id,
             guild_id=self.guild_id,
             type="mend",
-            expires_at=timestamp_from_hours(SIGNATURE_TTL_HOURS)
+            expires_at=now_ts + SIGNATURE_TTL_HOURS * 3600
         )
-        await self.storage.add_signature(mend_signature)
+        if not await self.storage.add_signature(mend_signature, now_ts):
+            return ActionResult(False, "You already have an active Mend signature on this target.")
+        
+        # Calculate healing
+        healing = 1 + mend_train.count
+        old_doom = target.doom
+        target.doom = max(0, target.doom - healing)
+        actual_healing = old_doom - target.doom
+        
+        # Mark actor as having acted today; target and actor are written together
+        actor.last_action_day = today
+        await self.storage.update_players_bulk([target, actor])
         
-        # Update train counts after adding signature
-        mend_train_after = await self.get_train_status(target_id, "mend")
+        # The new signature extends the train by one and is the freshest mark on it
+        mend_train_after = TrainStatus(mend_train.count + 1, get_freshness_bucket(0))
         
         ephemeral_msg = f"Your Mend heals {actual_healing} Doom from <@{target_id}>. They are now at {target.doom}/{THRESHOLD} Doom."
         
@@ -307,10 +341,13 @@ class GameLogic:
             new_doom=target.doom
         )
     
+    @transactional
     async def claim_signature(self, claimant_id: str, target_id: str, claim_type: str) -> ActionResult:
         """Make a public claim about contributing to a signature train."""
-        claimant = await self.storage.get_player(claimant_id, self.guild_id)
-        target = await self.storage.get_player(target_id, self.guild_id)
+        claimant, target = await asyncio.gather(
+            self.storage.get_player(claimant_id, self.guild_id),
+            self.storage.get_player(target_id, self.guild_id),
+        )
         
         if not claimant or not claimant.active:
             return ActionResult(False, "You are not in the game.")
@@ -318,12 +355,13 @@ class GameLogic:
         if not target or not target.active:
             return ActionResult(False, "Target is not in the game.")
         
-        # Get current mark status and claims
-        signatures = await self.storage.get_signatures(target_id, claim_type, self.guild_id)
-        current_claims = await self.storage.get_claims(target_id, claim_type, self.guild_id)
-        
-        signature_count = len(signatures)
-        claim_count = len(current_claims)
+        # Get current mark status and claims, all judged against the same instant
+        now_ts = now_timestamp()
+        (signature_count, train_expires_at, _), claim_count, already_claimed = await asyncio.gather(
+            self.storage.get_train_aggregate(target_id, claim_type, self.guild_id, now_ts),
+            self.storage.count_claims(target_id, claim_type, self.guild_id, now_ts),
+            self.storage.has_claim(target_id, claim_type, claimant_id, self.guild_id, now_ts),
+        )
         
         if signature_count == 0:
             return ActionResult(False, f"There is no active {claim_type} train on <@{target_id}>.")
@@ -332,14 +370,10 @@ class GameLogic:
             return ActionResult(False, f"The {claim_type} train on <@{target_id}> already has the maximum number of claims ({signature_count}).")
         
         # Check if user already claimed
-        existing_claim = any(claim.claimant_id == claimant_id for claim in current_claims)
-        if existing_claim:
+        if already_claimed:
             return ActionResult(False, f"You have already claimed the {claim_type} train on <@{target_id}>.")
         
-        # Calculate when this train will expire (when the oldest signature expires)
-        train_expires_at = min(sig.expires_at for sig in signatures)
-        
-        # Add the claim
+        # Add the claim; it expires with the train's oldest signature
         from .models import Claim
         claim = Claim(
             target_id=target_id,
@@ -359,10 +393,13 @@ class GameLogic:
             public_msg
         )
     
+    @transactional
     async def unclaim_signature(self, claimant_id: str, target_id: str, claim_type: str) -> ActionResult:
         """Remove a public claim."""
-        claimant = await self.storage.get_player(claimant_id, self.guild_id)
-        target = await self.storage.get_player(target_id, self.guild_id)
+        claimant, target = await asyncio.gather(
+            self.storage.get_player(claimant_id, self.guild_id),
+            self.storage.get_player(target_id, self.guild_id),
+        )
         
         if not claimant or not claimant.active:
             return ActionResult(False, "You are not in the game.")
@@ -370,26 +407,18 @@ class GameLogic:
         if not target or not target.active:
             return ActionResult(False, "Target is not in the game.")
         
-        current_claims = await self.storage.get_claims(target_id, claim_type, self.guild_id)
-        existing_claim = any(claim.claimant_id == claimant_id for claim in current_claims)
-        
-        if not existing_claim:
+        if not await self.storage.remove_claim(target_id, claim_type, claimant_id, self.guild_id):
             return ActionResult(False, f"You have no claim on the {claim_type} train for <@{target_id}>.")
         
-        await self.storage.remove_claim(target_id, claim_type, claimant_id, self.guild_id)
-        
         action_name = "hexed" if claim_type == "hex" else "mended"
         return ActionResult(
             True,
             f"You have removed your claim to have {action_name} <@{target_id}>."
         )
     
-    async def check_game_end(self) -> str:
+    async def check_game_end(self) -> Optional[str]:
         """Check if the game has ended and return winner ID if so."""
-        active_players = await self.storage.get_active_players(self.guild_id)
-        if len(active_players) == 1:
-            return active_players[0].user_id
-        return None
+        return await self.storage.get_sole_active_player(self.guild_id)
     
     async def reset_game(self) -> bool:
         """Reset the game state for a new game."""
@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Player:
     """Represents a player in the game."""
     user_id: str
@@ -16,7 +16,7 @@ class Player:
     active: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Signature:
     """Represents a Hex or Mend signature on a target."""
     target_id: str
@@ -26,7 +26,7 @@ class Signature:
     expires_at: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Claim:
     """Represents a public claim on a target's train."""
     target_id: str
@@ -36,14 +36,14 @@ class Claim:
     expires_at: int
 
 
-@dataclass
+@dataclass(slots=True)
 class TrainStatus:
     """Status of a signature train on a target."""
     count: int
     freshness: str
 
 
-@dataclass
+@dataclass(slots=True)
 class PlayerStatus:
     """Public status of a player."""
     user_id: str
@@ -53,7 +53,7 @@ class PlayerStatus:
     veil_hours_remaining: Optional[float] = None  # Only for self inspection
 
 
-@dataclass
+@dataclass(slots=True)
 class ActionResult:
     """Result of performing a game action."""
     success: bool
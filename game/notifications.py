@@ -1,6 +1,8 @@
 """Notification system for Ritual War."""
 
 import os
+from typing import Dict, Optional, Tuple
+
 import discord
 from .config import RITUAL_WAR_CHANNEL_ID
 from .storage import GameStorage
@@ -9,26 +11,50 @@ from .storage import GameStorage
 class NotificationManager:
     """Handles channel restrictions and DM notifications."""
     
+    # (database path, guild_id) -> configured public channel ID, or None when known to be unset.
+    # Shared by every NotificationManager in the process (the game and admin cogs each own one)
+    # so a write through either is seen by both; keyed by database so separate files stay apart.
+    _channel_cache: Dict[Tuple[str, str], Optional[int]] = {}
+    
     def __init__(self, bot):
         self.bot = bot
         self.storage = GameStorage()
     
-    async def send_public_message(self, interaction: discord.Interaction, content=None, embed=None):
-        """Send public message to configured channel or fallback."""
+    async def get_public_channel_id(self, guild_id: str) -> Optional[int]:
+        """Get the configured public channel for a guild, reading the database only on a cache miss."""
+        key = (self.storage.db_path, guild_id)
+        if key in self._channel_cache:
+            return self._channel_cache[key]
+        
+        value = await self.storage.get_state("public_channel", guild_id)
+        channel_id = self._channel_cache[key] = int(value) if value else None
+        return channel_id
+    
+    async def set_public_channel(self, guild_id: str, channel_id: Optional[int]):
+        """Store (or clear, with None) the public channel for a guild and update the cache."""
+        await self.storage.set_state("public_channel", str(channel_id) if channel_id else "", guild_id)
+        self._channel_cache[(self.storage.db_path, guild_id)] = channel_id or None
+    
+    def invalidate_public_channel(self, guild_id: str):
+        """Drop the cached channel for a guild (e.g. after its state was wiped by a reset)."""
+        self._channel_cache.pop((self.storage.db_path, guild_id), None)
+    
+    async def send_public_message(self, interaction: discord.Interaction, content=None, embed=None) -> bool:
+        """Send public message to configured channel or fallback. Returns whether it was delivered."""
         try:
             channel = None
             guild_id = str(interaction.guild_id) if interaction.guild_id else "DM"
             
             # Check if there's a configured channel for this guild
-            configured_channel_id = await self.storage.get_state("public_channel", guild_id)
+            configured_channel_id = await self.get_public_channel_id(guild_id)
             
             if configured_channel_id:
                 # Use the configured channel
-                channel = self.bot.get_channel(int(configured_channel_id))
+                channel = self.bot.get_channel(configured_channel_id)
                 if not channel:
                     # Channel was deleted or bot can't access it
                     print(f"Configured channel {configured_channel_id} not accessible, clearing setting")
-                    await self.storage.set_state("public_channel", "", guild_id)  # Clear invalid setting
+                    await self.set_public_channel(guild_id, None)  # Clear invalid setting
             
             # If no configured channel or it's not accessible, use fallback logic
             if not channel:
@@ -45,6 +71,7 @@ class NotificationManager:
                 await channel.send(content)
             elif embed:
                 await channel.send(embed=embed)
+            return True
             
         except Exception as e:
             print(f"Failed to send public message: {e}")
@@ -54,11 +81,12 @@ class NotificationManager:
                     await interaction.followup.send(content)
                 elif embed:
                     await interaction.followup.send(embed=embed)
+                return True
             except:
-                pass
+                return False
     
     
-    async def send_victory_announcement(self, interaction: discord.Interaction, winner_id: str, winner_name: str):
+    async def send_victory_announcement(self, interaction: discord.Interaction, winner_id: str, winner_name: str) -> bool:
         """Send public victory announcement."""
         embed = discord.Embed(
             title="🎉 Ritual War Complete!",
@@ -77,4 +105,4 @@ class NotificationManager:
         )
         embed.set_footer(text="Congratulations to our champion!")
         
-        await self.send_public_message(interaction, embed=embed)
\ No newline at end of file
+        return await self.send_public_message(interaction, embed=embed)
\ No newline at end of file
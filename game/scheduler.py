@@ -2,19 +2,63 @@
 
 import asyncio
 import logging
-from datetime import datetime, time, timedelta
-from typing import List
+from datetime import timedelta
+from functools import lru_cache
+from typing import Dict, List
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 
+from .config import PURGE_INTERVAL_SECONDS, REMINDER_CONCURRENCY, REMINDER_DELAY_SECONDS, REMINDER_HOUR, VACUUM_INTERVAL_SECONDS
 from .storage import GameStorage
-from .timeutils import get_timezone, today_key
+from .timeutils import get_timezone, now, today_key
 
 
 logger = logging.getLogger(__name__)
 
 
+def _seconds_until_next_reminder() -> float:
+    """Seconds from now until the next REMINDER_HOUR:00 in the game timezone."""
+    current = now()
+    next_run = current.replace(hour=REMINDER_HOUR, minute=0, second=0, microsecond=0)
+    if next_run <= current:
+        next_run += timedelta(days=1)
+    # Compare as timestamps so a DST change between now and the next run is accounted for
+    return next_run.timestamp() - current.timestamp()
+
+
+@lru_cache(maxsize=256)
+def _build_reminder_embed(guild_name: str, doom: int) -> discord.Embed:
+    """Build the daily reminder embed; only the guild name and Doom vary, so it's shared between players."""
+    embed = discord.Embed(
+        title="🎭 Ritual War - Daily Action Available",
+        description=f"Your daily action is now available in **{guild_name}**! Choose wisely...",
+        color=0x800080
+    )
+    
+    embed.add_field(
+        name="Current Status", 
+        value=f"Doom: {doom}/12", 
+        inline=True
+    )
+    
+    embed.add_field(
+        name="Available Actions",
+        value="• `/hex @target` - Attack a player\n• `/shield` - Defend yourself\n• `/mend @target` - Heal a player",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Game Info",
+        value="• Use `/leaderboard` to see current standings\n• Use `/inspect` to check your status\n• Remember: Only one action per day!",
+        inline=False
+    )
+    
+    embed.set_footer(text="May the best Mage survive! ⚔️")
+    
+    return embed
+
+
 class DailyScheduler:
     """Handles daily notifications to players."""
     
@@ -23,113 +67,154 @@ class DailyScheduler:
         self.storage = GameStorage()
         self.timezone = get_timezone()
         
-        # Start the daily notification task
-        self.daily_notifications.start()
+        # Start the daily notification and expiry purge tasks
+        self._runner = asyncio.create_task(self._daily_runner())
+        self._purger = asyncio.create_task(self._purge_runner())
     
     def cog_unload(self):
         """Clean shutdown of the scheduler."""
-        self.daily_notifications.cancel()
+        self._runner.cancel()
+        self._purger.cancel()
+    
+    async def _daily_runner(self):
+        """Sleep until the next reminder time, send the reminders, and repeat."""
+        await self.bot.wait_until_ready()
+        logger.info("Daily notification scheduler initialized")
+        
+        last_run_day = None
+        while True:
+            await asyncio.sleep(_seconds_until_next_reminder())
+            
+            # The sleep can end a moment before REMINDER_HOUR on the wall clock, so the next
+            # pass may land on the same day again; never send twice in one game day
+            if today_key() == last_run_day:
+                continue
+            last_run_day = today_key()
+            await self.daily_notifications()
+    
+    async def _purge_runner(self):
+        """Delete expired signatures and claims every few minutes, off the command path.
+        
+        Each pass also refreshes planner statistics, and the database is vacuumed about once a week.
+        """
+        await self.bot.wait_until_ready()
+        loop = asyncio.get_running_loop()
+        next_vacuum = loop.time() + VACUUM_INTERVAL_SECONDS
+        
+        while True:
+            try:
+                purged = await self.storage.purge_all_expired()
+                if purged:
+                    logger.info(f"Purged {purged} expired signatures and claims.")
+                await self.storage.optimize()
+            except Exception as e:
+                logger.error(f"Failed to purge expired signatures and claims: {str(e)}")
+            
+            if loop.time() >= next_vacuum:
+                next_vacuum = loop.time() + VACUUM_INTERVAL_SECONDS
+                try:
+                    await self.storage.maintenance()
+                    logger.info("Vacuumed the game database.")
+                except Exception as e:
+                    logger.error(f"Failed to vacuum the game database: {str(e)}")
+            
+            await asyncio.sleep(PURGE_INTERVAL_SECONDS)
     
-    @tasks.loop(time=time(hour=8, minute=0, tzinfo=get_timezone()))  # 8 AM Pacific
     async def daily_notifications(self):
         """Send daily action reminder to all active players across all guilds."""
         try:
             logger.info("Starting daily notifications...")
             
-            # Get all guilds the bot is in
-            total_notifications = 0
-            total_players = 0
+            # Collect everyone due a reminder, then send the DMs with bounded concurrency
+            pending = []
+            guild_totals = {}
+            resolved: Dict[int, discord.abc.User] = {}
+            current_day = today_key()
             
             for guild in self.bot.guilds:
                 guild_id = str(guild.id)
                 logger.info(f"Processing notifications for guild: {guild.name} ({guild_id})")
                 
-                # Get active players for this guild
-                players = await self.storage.get_active_players(guild_id)
-                if not players:
-                    logger.info(f"No active players found in guild {guild.name}")
+                # Only players who are still active and haven't acted today
+                due = await self.storage.get_players_needing_reminder(guild_id, current_day)
+                if not due:
+                    logger.info(f"No players need a reminder in guild {guild.name}")
                     continue
                 
-                guild_notifications = 0
-                current_day = today_key()
-                
-                for player in players:
-                    # Skip if player already acted today
-                    if player.last_action_day == current_day:
-                        continue
-                    
+                guild_totals[guild_id] = (guild.name, len(due))
+                pending.extend((guild, user_id, doom) for user_id, doom in due)
+                resolved.update(await self._resolve_users(guild, [int(user_id) for user_id, _ in due]))
+            
+            sem = asyncio.Semaphore(REMINDER_CONCURRENCY)
+            
+            async def _notify(guild: discord.Guild, user_id: str, doom: int) -> bool:
+                async with sem:
                     try:
-                        # Try to get Discord user
-                        if player.user_id.startswith("test_user_"):
-                            continue  # Skip test users
-                        
-                        user = self.bot.get_user(int(player.user_id))
+                        user = resolved.get(int(user_id))
                         if not user:
-                            # Try to fetch user if not in cache
-                            user = await self.bot.fetch_user(int(player.user_id))
+                            # Not cached or returned by the member query; fall back to the REST API
+                            user = await self.bot.fetch_user(int(user_id))
                         
-                        if user:
-                            await self.send_daily_reminder(user, player.doom, guild.name)
-                            guild_notifications += 1
-                            total_notifications += 1
-                            
-                            # Small delay to avoid rate limits
-                            await asyncio.sleep(0.5)
-                            
+                        if not user:
+                            return False
+                        await self.send_daily_reminder(user, doom, guild.name)
+                        return True
                     except Exception as e:
-                        logger.error(f"Failed to send daily notification to user {player.user_id} in guild {guild.name}: {str(e)}")
-                        continue
-                
-                total_players += len(players)
-                logger.info(f"Guild {guild.name}: Sent {guild_notifications} notifications to {len(players)} total players.")
+                        logger.error(f"Failed to send daily notification to user {user_id} in guild {guild.name}: {str(e)}")
+                        return False
+                    finally:
+                        # Small delay per sender to stay under the DM rate limit
+                        await asyncio.sleep(REMINDER_DELAY_SECONDS)
+            
+            results = await asyncio.gather(*(_notify(*item) for item in pending), return_exceptions=True)
+            
+            guild_notifications = dict.fromkeys(guild_totals, 0)
+            for (guild, _, _), sent in zip(pending, results):
+                if sent is True:
+                    guild_notifications[str(guild.id)] += 1
+            total_notifications = sum(guild_notifications.values())
             
-            logger.info(f"Daily notifications complete. Sent {total_notifications} notifications to {total_players} total players across {len(self.bot.guilds)} guilds.")
+            for guild_id, (guild_name, due_count) in guild_totals.items():
+                logger.info(f"Guild {guild_name}: Sent {guild_notifications[guild_id]} of {due_count} due notifications.")
+            
+            logger.info(f"Daily notifications complete. Sent {total_notifications} of {len(pending)} due notifications across {len(self.bot.guilds)} guilds.")
             
         except Exception as e:
             logger.error(f"Error in daily notifications task: {str(e)}")
     
+    async def _resolve_users(self, guild: discord.Guild, user_ids: List[int]) -> Dict[int, discord.abc.User]:
+        """Resolve users from the cache, querying the gateway in bulk for any that are missing."""
+        resolved = {}
+        missing = []
+        for user_id in user_ids:
+            user = guild.get_member(user_id) or self.bot.get_user(user_id)
+            if user:
+                resolved[user_id] = user
+            else:
+                missing.append(user_id)
+        
+        # One gateway request per 100 users instead of one HTTP fetch per user
+        for start in range(0, len(missing), 100):
+            try:
+                members = await guild.query_members(user_ids=missing[start:start + 100], cache=True)
+            except Exception as e:
+                # Keep what has resolved so far; users left out fall back to fetch_user
+                logger.warning("Member query failed for guild %s, falling back to fetch_user: %s", guild.name, e)
+                continue
+            resolved.update((member.id, member) for member in members)
+        
+        return resolved
+    
     async def send_daily_reminder(self, user: discord.User, doom: int, guild_name: str = "Unknown Server"):
         """Send a daily reminder DM to a player."""
         try:
-            embed = discord.Embed(
-                title="🎭 Ritual War - Daily Action Available",
-                description=f"Your daily action is now available in **{guild_name}**! Choose wisely...",
-                color=0x800080
-            )
-            
-            embed.add_field(
-                name="Current Status", 
-                value=f"Doom: {doom}/12", 
-                inline=True
-            )
-            
-            embed.add_field(
-                name="Available Actions",
-                value="• `/hex @target` - Attack a player\n• `/shield` - Defend yourself\n• `/mend @target` - Heal a player",
-                inline=False
-            )
-            
-            embed.add_field(
-                name="Game Info",
-                value="• Use `/leaderboard` to see current standings\n• Use `/inspect` to check your status\n• Remember: Only one action per day!",
-                inline=False
-            )
-            
-            embed.set_footer(text="May the best Mage survive! ⚔️")
-            
-            await user.send(embed=embed)
+            await user.send(embed=_build_reminder_embed(guild_name, doom))
             logger.debug(f"Sent daily reminder to {user.display_name} (ID: {user.id})")
             
         except discord.Forbidden:
             logger.warning(f"Cannot send DM to user {user.display_name} (ID: {user.id}) - DMs disabled")
         except Exception as e:
             logger.error(f"Error sending daily reminder to {user.display_name} (ID: {user.id}): {str(e)}")
-    
-    @daily_notifications.before_loop
-    async def before_daily_notifications(self):
-        """Wait for bot to be ready before starting notifications."""
-        await self.bot.wait_until_ready()
-        logger.info("Daily notification scheduler initialized")
 
 
 async def setup(bot: commands.Bot):
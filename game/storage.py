@@ -1,10 +1,102 @@
 """Database storage layer for Ritual War."""
 
 import aiosqlite
-from typing import List, Optional, Dict, Any
+import asyncio
+import functools
+import time
+from aiosqlitepool import SQLiteConnectionPool
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Dict, Any, Tuple
 from .models import Player, Signature, Claim
-from .config import DATABASE_PATH
-from .timeutils import now
+from .config import DATABASE_PATH, RUN_LEGACY_MIGRATION, DB_POOL_SIZE, STATEMENT_CACHE_SIZE, LOCKOUT_CACHE_SECONDS
+from .timeutils import now_timestamp
+
+
+# Applied to the writer and every pooled reader. WAL lets readers run alongside the writer and, with
+# synchronous=NORMAL, drops the fsync on every commit; the rest keep more pages in memory
+# and make a busy writer wait instead of failing.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=30000",
+)
+
+# Columns in dataclass field order, so rows can be passed to the models positionally
+_PLAYER_COLUMNS = "user_id, guild_id, joined_at, doom, veil_until, last_action_day, active"
+_SIGNATURE_COLUMNS = "target_id, signer_id, guild_id, type, expires_at"
+
+# Column definitions for the tables keyed purely by their composite primary key
+_KEYED_TABLES = {
+    "signatures": """
+        target_id TEXT NOT NULL,
+        signer_id TEXT NOT NULL,
+        guild_id TEXT NOT NULL,
+        type TEXT NOT NULL CHECK(type IN ('hex','mend')),
+        expires_at INTEGER NOT NULL,
+        PRIMARY KEY(target_id, signer_id, guild_id, type)
+    """,
+    "claims": """
+        target_id TEXT NOT NULL,
+        guild_id TEXT NOT NULL,
+        type TEXT NOT NULL CHECK(type IN ('hex','mend')),
+        claimant_id TEXT NOT NULL,
+        expires_at INTEGER NOT NULL,
+        PRIMARY KEY(target_id, guild_id, type, claimant_id)
+    """,
+    "state": """
+        guild_id TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY(guild_id, key)
+    """,
+}
+
+# Bumped whenever _create_tables changes the schema; stored in the state table under a
+# reserved guild ID so startup can skip table introspection once the schema is current
+_SCHEMA_VERSION = "1"
+_SCHEMA_GUILD = "_schema"
+
+# Connection pools keyed by database path, shared by every GameStorage in the process
+_pools: Dict[str, SQLiteConnectionPool] = {}
+
+# One long-lived writer connection per database path, with the lock that serializes its use.
+# Every write goes through it, so there is a single writer and its statement cache stays warm.
+_writers: Dict[str, aiosqlite.Connection] = {}
+_write_locks: Dict[str, asyncio.Lock] = {}
+
+# State values per database path, keyed by (guild_id, key). They change at most a few times
+# per game (e.g. the roster lock), so reads are served from here after the first one; writes
+# go through set_state and update the entry.
+_state_caches: Dict[str, Dict[Tuple[str, str], Optional[str]]] = {}
+
+# Lockouts per database path, keyed by (user_id, guild_id), with the monotonic time they
+# expire. An interaction often reads them more than once, so they are reused for a few seconds.
+_lockout_caches: Dict[str, Dict[Tuple[str, str], Tuple[float, Dict[str, Tuple[str, ...]]]]] = {}
+
+# Connection shared by the current task's transaction or connection block, if any (see GameStorage._scoped)
+_current_db: ContextVar[Optional[aiosqlite.Connection]] = ContextVar("ritual_war_db", default=None)
+
+
+def transactional(method):
+    """Run a method of an object with a `storage` attribute inside a single storage transaction."""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        async with self.storage.transaction():
+            return await method(self, *args, **kwargs)
+    return wrapper
+
+
+def shares_connection(method):
+    """Run a method of an object with a `storage` attribute on one shared storage connection."""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        async with self.storage.connection():
+            return await method(self, *args, **kwargs)
+    return wrapper
 
 
 class GameStorage:
@@ -12,87 +104,262 @@ class GameStorage:
     
     def __init__(self, db_path: str = DATABASE_PATH):
         self.db_path = db_path
+        # Shared with every other GameStorage on the same database file
+        self._state_cache = _state_caches.setdefault(db_path, {})
+        self._lockout_cache = _lockout_caches.setdefault(db_path, {})
+    
+    async def _new_connection(self, query_only: bool = False) -> aiosqlite.Connection:
+        """Open a long-lived connection; settings made here last for the connection's lifetime."""
+        db = await aiosqlite.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in _CONNECTION_PRAGMAS:
+            await db.execute(pragma)
+        if query_only:
+            # Set last: switching the journal mode above counts as a write
+            await db.execute("PRAGMA query_only=ON")
+        return db
+    
+    def _open(self):
+        """Borrow a read-only connection from the pool shared by every GameStorage on this database file."""
+        pool = _pools.get(self.db_path)
+        if pool is None:
+            factory = functools.partial(self._new_connection, query_only=True)
+            pool = _pools[self.db_path] = SQLiteConnectionPool(factory, pool_size=DB_POOL_SIZE)
+        return pool.connection()
+    
+    @asynccontextmanager
+    async def _writer(self):
+        """Hold the writer connection for this database file, opening it on first use."""
+        lock = _write_locks.setdefault(self.db_path, asyncio.Lock())
+        async with lock:
+            db = _writers.get(self.db_path)
+            if db is None:
+                db = _writers[self.db_path] = await self._new_connection()
+            yield db
+    
+    async def close(self):
+        """Close the connection pool and writer for this database file (they are recreated on next use)."""
+        pool = _pools.pop(self.db_path, None)
+        if pool is not None:
+            await pool.close()
+        
+        async with _write_locks.setdefault(self.db_path, asyncio.Lock()):
+            writer = _writers.pop(self.db_path, None)
+            if writer is not None:
+                await writer.close()
+    
+    @asynccontextmanager
+    async def _connect(self):
+        """Yield the current block's connection for a read, or a pooled read-only one."""
+        db = _current_db.get()
+        if db is not None:
+            yield db
+            return
+        
+        async with self._open() as db:
+            yield db
+    
+    @asynccontextmanager
+    async def _write(self):
+        """Yield the current transaction's connection, or the writer connection committing on exit."""
+        db = _current_db.get()
+        if db is not None and db is _writers.get(self.db_path):
+            yield db
+            return
+        
+        async with self._writer() as db:
+            try:
+                yield db
+                await db.commit()
+            except BaseException:
+                await self._abort(db)
+                raise
+    
+    @asynccontextmanager
+    async def transaction(self):
+        """Run every storage call inside the block on one connection and commit once at the end.
+        
+        Transactions run on the writer connection, one at a time. Nested blocks join the outer
+        transaction. BEGIN IMMEDIATE takes SQLite's write lock up front, so another process
+        can't take it between this transaction's reads and its writes.
+        """
+        async with self._scoped(immediate=True):
+            yield
+    
+    @asynccontextmanager
+    async def savepoint(self):
+        """Undo only this block's writes if it raises, leaving the enclosing transaction() open."""
+        db = _current_db.get()
+        await db.execute("SAVEPOINT block")
+        try:
+            yield
+        except BaseException:
+            await db.execute("ROLLBACK TO block")
+            await db.execute("RELEASE block")
+            self._state_cache.clear()
+            self._lockout_cache.clear()
+            raise
+        else:
+            await db.execute("RELEASE block")
+    
+    @asynccontextmanager
+    async def connection(self):
+        """Share one connection across every storage call inside the block without taking the write lock.
+        
+        Meant for read-mostly work such as building displays; joins an open transaction if there is one.
+        """
+        async with self._scoped(immediate=False):
+            yield
+    
+    @asynccontextmanager
+    async def _scoped(self, immediate: bool):
+        """Open a connection for the current task and commit (or roll back) when the block exits.
+        
+        Transactions take the writer; connection blocks borrow a pooled connection. Either joins
+        an enclosing block, except that a transaction inside a connection block moves to the writer.
+        """
+        current = _current_db.get()
+        if current is not None and (not immediate or current is _writers.get(self.db_path)):
+            yield
+            return
+        
+        async with (self._writer() if immediate else self._open()) as db:
+            if immediate:
+                await db.execute("BEGIN IMMEDIATE")
+            token = _current_db.set(db)
+            try:
+                yield
+                await db.commit()
+            except BaseException:
+                await self._abort(db)
+                raise
+            finally:
+                _current_db.reset(token)
+    
+    async def _abort(self, db: aiosqlite.Connection):
+        """Roll back after a failed block or commit and forget cached values it may have written."""
+        self._state_cache.clear()
+        self._lockout_cache.clear()
+        try:
+            await db.rollback()
+        except Exception:
+            # A writer left inside a transaction would fail every later BEGIN; replace it instead
+            if _writers.get(self.db_path) is db:
+                del _writers[self.db_path]
+                await db.close()
     
     async def initialize(self):
         """Initialize the database with required tables."""
         async with aiosqlite.connect(self.db_path) as db:
+            if await self._schema_version(db) == _SCHEMA_VERSION:
+                return
+            
+            await db.execute("BEGIN IMMEDIATE")
+            await self._create_tables(db)
+            # Give the planner statistics for the indexes it just got
+            await db.execute("ANALYZE")
+            await db.commit()
+    
+    async def _schema_version(self, db: aiosqlite.Connection) -> Optional[str]:
+        """Get the schema version stamped by _create_tables, or None before the first stamp."""
+        try:
+            async with db.execute(
+                "SELECT value FROM state WHERE guild_id = ? AND key = 'version'", (_SCHEMA_GUILD,)
+            ) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+        except aiosqlite.OperationalError:
+            # No state table yet, or a legacy one without guild_id
+            return None
+    
+    async def _create_tables(self, db: aiosqlite.Connection):
+        """Create any missing tables and indexes on the given connection without committing."""
+        if RUN_LEGACY_MIGRATION:
             # Check if guild_id column exists in players table
             cursor = await db.execute("PRAGMA table_info(players)")
             columns = await cursor.fetchall()
             has_guild_id = any(col[1] == 'guild_id' for col in columns)
-            
-            if not has_guild_id:
-                # Create new table with guild_id
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS players (
-                        user_id TEXT NOT NULL,
-                        guild_id TEXT NOT NULL,
-                        joined_at INTEGER NOT NULL,
-                        doom INTEGER NOT NULL DEFAULT 0,
-                        veil_until INTEGER,
-                        last_action_day TEXT,
-                        active INTEGER NOT NULL DEFAULT 1,
-                        PRIMARY KEY(user_id, guild_id)
-                    )
-                """)
-                
-                # Migrate existing data if old table exists
-                try:
-                    await db.execute("""
-                        INSERT INTO players (user_id, guild_id, joined_at, doom, veil_until, last_action_day, active)
-                        SELECT user_id, 'LEGACY_GUILD', joined_at, doom, veil_until, last_action_day, active
-                        FROM players_backup
-                    """)
-                except:
-                    # No existing data to migrate
-                    pass
-            else:
-                # Table already has guild_id, ensure it exists
+        
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS players (
+                user_id TEXT NOT NULL,
+                guild_id TEXT NOT NULL,
+                joined_at INTEGER NOT NULL,
+                doom INTEGER NOT NULL DEFAULT 0,
+                veil_until INTEGER,
+                last_action_day TEXT,
+                active INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY(user_id, guild_id)
+            )
+        """)
+        
+        if RUN_LEGACY_MIGRATION and not has_guild_id:
+            # Migrate existing data if old table exists
+            try:
                 await db.execute("""
-                    CREATE TABLE IF NOT EXISTS players (
-                        user_id TEXT NOT NULL,
-                        guild_id TEXT NOT NULL,
-                        joined_at INTEGER NOT NULL,
-                        doom INTEGER NOT NULL DEFAULT 0,
-                        veil_until INTEGER,
-                        last_action_day TEXT,
-                        active INTEGER NOT NULL DEFAULT 1,
-                        PRIMARY KEY(user_id, guild_id)
-                    )
+                    INSERT INTO players (user_id, guild_id, joined_at, doom, veil_until, last_action_day, active)
+                    SELECT user_id, 'LEGACY_GUILD', joined_at, doom, veil_until, last_action_day, active
+                    FROM players_backup
                 """)
+            except:
+                # No existing data to migrate
+                pass
+        
+        # Keyed tables are stored WITHOUT ROWID so primary-key lookups hit a single B-tree
+        for table, columns in _KEYED_TABLES.items():
+            await db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns}) WITHOUT ROWID")
+            await self._rebuild_without_rowid(db, table, columns)
+        
+        if await self._create_indexes(db):
+            await db.execute(
+                "INSERT INTO state (guild_id, key, value) VALUES (?, 'version', ?) "
+                "ON CONFLICT (guild_id, key) DO UPDATE SET value = excluded.value",
+                (_SCHEMA_GUILD, _SCHEMA_VERSION)
+            )
+    
+    async def _rebuild_without_rowid(self, db: aiosqlite.Connection, table: str, columns: str):
+        """Copy a table created before WITHOUT ROWID was used into the new layout, once."""
+        async with db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)) as cursor:
+            row = await cursor.fetchone()
+        
+        # Pre-guild legacy tables are rebuilt by migrate_legacy_data instead
+        if not row or "WITHOUT ROWID" in row[0].upper() or "guild_id" not in row[0]:
+            return
+        
+        await db.execute(f"ALTER TABLE {table} RENAME TO {table}_rowid")
+        await db.execute(f"CREATE TABLE {table} ({columns}) WITHOUT ROWID")
+        await db.execute(f"INSERT INTO {table} SELECT * FROM {table}_rowid")
+        await db.execute(f"DROP TABLE {table}_rowid")
+    
+    async def _create_indexes(self, db: aiosqlite.Connection) -> bool:
+        """Create secondary indexes on the guild-scoped tables. Returns False if the tables are still legacy."""
+        try:
+            # Active-roster lookups (reminders, game-end checks) filter on (guild_id, active)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_players_active ON players(guild_id, active)")
             
+            # Covers get_train_aggregate so a train's COUNT/MIN/MAX never touches the table
             await db.execute("""
-                CREATE TABLE IF NOT EXISTS signatures (
-                    target_id TEXT NOT NULL,
-                    signer_id TEXT NOT NULL,
-                    guild_id TEXT NOT NULL,
-                    type TEXT NOT NULL CHECK(type IN ('hex','mend')),
-                    expires_at INTEGER NOT NULL,
-                    PRIMARY KEY(target_id, signer_id, guild_id, type)
-                )
-            """)
-            
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS claims (
-                    target_id TEXT NOT NULL,
-                    guild_id TEXT NOT NULL,
-                    type TEXT NOT NULL CHECK(type IN ('hex','mend')),
-                    claimant_id TEXT NOT NULL,
-                    expires_at INTEGER NOT NULL,
-                    PRIMARY KEY(target_id, guild_id, type, claimant_id)
-                )
+                CREATE INDEX IF NOT EXISTS idx_signatures_train
+                ON signatures(target_id, type, guild_id, expires_at)
             """)
             
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS state (
-                    guild_id TEXT NOT NULL,
-                    key TEXT NOT NULL,
-                    value TEXT NOT NULL,
-                    PRIMARY KEY(guild_id, key)
-                )
-            """)
+            # Expiry sweeps delete by expires_at across all guilds
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_signatures_expiry ON signatures(expires_at)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_claims_expiry ON claims(expires_at)")
             
-            await db.commit()
+            # Lockouts and leave/clear look up rows by the acting player
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_signatures_signer ON signatures(signer_id, guild_id)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_claims_claimant ON claims(claimant_id, guild_id)")
+        except aiosqlite.OperationalError:
+            # Legacy tables without guild_id; migrate_legacy_data rebuilds them and creates the indexes
+            return False
+        return True
+    
+    async def warm_up(self):
+        """Touch each table once so the first real command doesn't pay the cold-start cost."""
+        async with self._connect() as db:
+            for table in ("players", "signatures", "claims", "state"):
+                async with db.execute(f"SELECT 1 FROM {table} LIMIT 1") as cursor:
+                    await cursor.fetchone()
     
     async def migrate_legacy_data(self, guild_id: str):
         """Migrate existing data to the new guild-aware format."""
@@ -103,14 +370,17 @@ class GameStorage:
                 table_sql = await cursor.fetchone()
                 
                 if table_sql and 'guild_id' not in table_sql[0]:
+                    # The whole rebuild commits at once or not at all
+                    await db.execute("BEGIN IMMEDIATE")
+                    
                     # Backup old table
                     await db.execute("ALTER TABLE players RENAME TO players_old")
                     await db.execute("ALTER TABLE signatures RENAME TO signatures_old")
                     await db.execute("ALTER TABLE claims RENAME TO claims_old")
                     await db.execute("ALTER TABLE state RENAME TO state_old")
                     
-                    # Recreate tables with new structure
-                    await self.initialize()
+                    # Recreate tables with new structure (on this connection, inside the transaction)
+                    await self._create_tables(db)
                     
                     # Migrate data
                     await db.execute("""
@@ -143,42 +413,73 @@ class GameStorage:
                     await db.execute("DROP TABLE claims_old")
                     await db.execute("DROP TABLE state_old")
                     
+                    # Index names moved with the renamed tables; recreate them on the new ones
+                    await self._create_indexes(db)
+                    
                     await db.commit()
+                    self._drop_cached_guild(guild_id)
                     
             except Exception:
-                # Migration not needed or already done
-                pass
+                # Migration not needed or already done; undo any partial rebuild
+                await db.rollback()
     
-    async def purge_expired(self, guild_id: str):
-        """Remove expired signatures and claims for a guild."""
-        current_time = int(now().timestamp())
+    async def purge_all_expired(self, now_ts: Optional[int] = None) -> int:
+        """Remove expired signatures and claims across every guild. Returns rows deleted."""
+        current_time = now_ts if now_ts is not None else now_timestamp()
         
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM signatures WHERE guild_id = ? AND expires_at <= ?", (guild_id, current_time))
-            await db.execute("DELETE FROM claims WHERE guild_id = ? AND expires_at <= ?", (guild_id, current_time))
-            await db.commit()
+        async with self._write() as db:
+            signatures = await db.execute("DELETE FROM signatures WHERE expires_at <= ?", (current_time,))
+            claims = await db.execute("DELETE FROM claims WHERE expires_at <= ?", (current_time,))
+            return signatures.rowcount + claims.rowcount
+    
+    async def optimize(self):
+        """Let SQLite refresh planner statistics for tables that changed enough to need it."""
+        async with self._write() as db:
+            await db.execute("PRAGMA optimize")
+    
+    async def maintenance(self):
+        """Compact the database file, reclaiming pages left free by deleted rows."""
+        # VACUUM can't run inside a transaction, so it takes the writer directly rather than via _write
+        async with self._writer() as db:
+            await db.execute("VACUUM")
     
     async def get_player(self, user_id: str, guild_id: str) -> Optional[Player]:
         """Get a player by user ID and guild ID."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM players WHERE user_id = ? AND guild_id = ?", (user_id, guild_id)) as cursor:
+        async with self._connect() as db:
+            async with db.execute(f"SELECT {_PLAYER_COLUMNS} FROM players WHERE user_id = ? AND guild_id = ?", (user_id, guild_id)) as cursor:
                 row = await cursor.fetchone()
                 if row:
-                    return Player(**dict(row))
+                    return Player(*row)
                 return None
     
     async def get_active_players(self, guild_id: str) -> List[Player]:
         """Get all active players in a guild."""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM players WHERE guild_id = ? AND active = 1", (guild_id,)) as cursor:
+        async with self._connect() as db:
+            async with db.execute(f"SELECT {_PLAYER_COLUMNS} FROM players WHERE guild_id = ? AND active = 1", (guild_id,)) as cursor:
+                rows = await cursor.fetchall()
+                return [Player(*row) for row in rows]
+    
+    async def get_sole_active_player(self, guild_id: str) -> Optional[str]:
+        """Get the user ID of the only active player in a guild, or None if there isn't exactly one."""
+        async with self._connect() as db:
+            async with db.execute("SELECT user_id FROM players WHERE guild_id = ? AND active = 1 LIMIT 2", (guild_id,)) as cursor:
                 rows = await cursor.fetchall()
-                return [Player(**dict(row)) for row in rows]
+                return rows[0][0] if len(rows) == 1 else None
+    
+    async def get_players_needing_reminder(self, guild_id: str, today: str) -> List[Tuple[str, int]]:
+        """Get (user_id, doom) for active players in a guild who haven't acted today, excluding test users."""
+        async with self._connect() as db:
+            async with db.execute("""
+                SELECT user_id, doom FROM players
+                WHERE guild_id = ? AND active = 1
+                  AND (last_action_day IS NULL OR last_action_day != ?)
+                  AND user_id NOT LIKE 'test\\_user\\_%' ESCAPE '\\'
+            """, (guild_id, today)) as cursor:
+                return await cursor.fetchall()
     
     async def create_player(self, user_id: str, guild_id: str) -> Player:
         """Create a new player."""
-        joined_at = int(now().timestamp())
+        joined_at = now_timestamp()
         player = Player(
             user_id=user_id,
             guild_id=guild_id,
@@ -189,149 +490,227 @@ class GameStorage:
             active=1
         )
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute("""
                 INSERT INTO players (user_id, guild_id, joined_at, doom, veil_until, last_action_day, active)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (player.user_id, player.guild_id, player.joined_at, player.doom, player.veil_until, player.last_action_day, player.active))
-            await db.commit()
         
         return player
     
-    async def update_player(self, player: Player):
-        """Update a player's data."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
+    async def update_player(self, player: Player) -> Optional[Player]:
+        """Update a player's data and return the stored row, or None if the player doesn't exist."""
+        async with self._write() as db:
+            async with db.execute(f"""
                 UPDATE players 
                 SET doom = ?, veil_until = ?, last_action_day = ?, active = ?
                 WHERE user_id = ? AND guild_id = ?
-            """, (player.doom, player.veil_until, player.last_action_day, player.active, player.user_id, player.guild_id))
-            await db.commit()
+                RETURNING {_PLAYER_COLUMNS}
+            """, (player.doom, player.veil_until, player.last_action_day, player.active, player.user_id, player.guild_id)) as cursor:
+                row = await cursor.fetchone()
+                return Player(*row) if row else None
     
-    async def get_signatures(self, target_id: str, sig_type: str, guild_id: str) -> List[Signature]:
-        """Get all signatures of a specific type on a target in a guild."""
-        await self.purge_expired(guild_id)
+    async def bulk_clear_last_action_day(self, guild_id: str) -> int:
+        """Clear the daily action marker for every active player in a guild. Returns rows updated."""
+        async with self._write() as db:
+            cursor = await db.execute(
+                "UPDATE players SET last_action_day = NULL WHERE guild_id = ? AND active = 1",
+                (guild_id,)
+            )
+            return cursor.rowcount
+    
+    async def update_players_bulk(self, players: List[Player]):
+        """Update several players' data in one statement."""
+        async with self._write() as db:
+            await db.executemany("""
+                UPDATE players 
+                SET doom = ?, veil_until = ?, last_action_day = ?, active = ?
+                WHERE user_id = ? AND guild_id = ?
+            """, [(p.doom, p.veil_until, p.last_action_day, p.active, p.user_id, p.guild_id) for p in players])
+    
+    async def get_all_signatures_for_target(self, target_id: str, guild_id: str, now_ts: Optional[int] = None) -> List[Signature]:
+        """Get every live signature, of either type, on a target in a guild."""
+        current_time = now_ts if now_ts is not None else now_timestamp()
         
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._connect() as db:
             async with db.execute(
-                "SELECT * FROM signatures WHERE target_id = ? AND type = ? AND guild_id = ?", 
-                (target_id, sig_type, guild_id)
+                f"SELECT {_SIGNATURE_COLUMNS} FROM signatures WHERE target_id = ? AND guild_id = ? AND expires_at > ?",
+                (target_id, guild_id, current_time)
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [Signature(**dict(row)) for row in rows]
+                return [Signature(*row) for row in rows]
     
-    async def has_signature(self, target_id: str, signer_id: str, sig_type: str, guild_id: str) -> bool:
-        """Check if a signer has an active signature of a type on a target in a guild."""
-        await self.purge_expired(guild_id)
+    async def get_train_aggregate(self, target_id: str, sig_type: str, guild_id: str, now_ts: Optional[int] = None) -> Tuple[int, Optional[int], Optional[int]]:
+        """Get the number of live signatures on a train and the earliest and latest expiry among them."""
+        current_time = now_ts if now_ts is not None else now_timestamp()
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute(
-                "SELECT COUNT(*) FROM signatures WHERE target_id = ? AND signer_id = ? AND type = ? AND guild_id = ?",
-                (target_id, signer_id, sig_type, guild_id)
+                "SELECT COUNT(*), MIN(expires_at), MAX(expires_at) FROM signatures WHERE target_id = ? AND type = ? AND guild_id = ? AND expires_at > ?",
+                (target_id, sig_type, guild_id, current_time)
             ) as cursor:
-                count = await cursor.fetchone()
-                return count[0] > 0
+                count, oldest_expires_at, latest_expires_at = await cursor.fetchone()
+                return count, oldest_expires_at, latest_expires_at
     
-    async def add_signature(self, signature: Signature):
-        """Add or refresh a signature."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO signatures (target_id, signer_id, guild_id, type, expires_at)
+    async def get_train_counts(self, guild_id: str, now_ts: Optional[int] = None) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """Get the live signature count and latest expiry of every train in a guild, keyed by (target_id, type)."""
+        current_time = now_ts if now_ts is not None else now_timestamp()
+        
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT target_id, type, COUNT(*), MAX(expires_at) FROM signatures WHERE guild_id = ? AND expires_at > ? GROUP BY target_id, type",
+                (guild_id, current_time)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return {(target_id, sig_type): (count, latest_expires_at) for target_id, sig_type, count, latest_expires_at in rows}
+    
+    async def add_signature(self, signature: Signature, now_ts: Optional[int] = None) -> bool:
+        """Add a signature, replacing an expired one from the same signer.
+        
+        Returns False without writing if the signer already has a live signature of this type on the target.
+        """
+        current_time = now_ts if now_ts is not None else now_timestamp()
+        
+        async with self._write() as db:
+            cursor = await db.execute("""
+                INSERT INTO signatures (target_id, signer_id, guild_id, type, expires_at)
                 VALUES (?, ?, ?, ?, ?)
-            """, (signature.target_id, signature.signer_id, signature.guild_id, signature.type, signature.expires_at))
-            await db.commit()
+                ON CONFLICT (target_id, signer_id, guild_id, type)
+                DO UPDATE SET expires_at = excluded.expires_at WHERE signatures.expires_at <= ?
+            """, (signature.target_id, signature.signer_id, signature.guild_id, signature.type, signature.expires_at, current_time))
+            inserted = cursor.rowcount > 0
+            await cursor.close()
+        
+        if inserted:
+            self._lockout_cache.pop((signature.signer_id, signature.guild_id), None)
+        return inserted
     
-    async def clear_signatures(self, user_id: str, guild_id: str):
-        """Clear all signatures for a user in a guild (when they leave)."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM signatures WHERE signer_id = ? AND guild_id = ?", (user_id, guild_id))
-            await db.commit()
+    async def count_claims(self, target_id: str, claim_type: str, guild_id: str, now_ts: Optional[int] = None) -> int:
+        """Count live claims of a specific type on a target in a guild."""
+        current_time = now_ts if now_ts is not None else now_timestamp()
+        
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT COUNT(*) FROM claims WHERE target_id = ? AND type = ? AND guild_id = ? AND expires_at > ?",
+                (target_id, claim_type, guild_id, current_time)
+            ) as cursor:
+                row = await cursor.fetchone()
+                return row[0]
     
-    async def get_claims(self, target_id: str, claim_type: str, guild_id: str) -> List[Claim]:
-        """Get all claims of a specific type on a target in a guild."""
-        await self.purge_expired(guild_id)
+    async def has_claim(self, target_id: str, claim_type: str, claimant_id: str, guild_id: str, now_ts: Optional[int] = None) -> bool:
+        """Check if a claimant has a live claim of a type on a target in a guild."""
+        current_time = now_ts if now_ts is not None else now_timestamp()
         
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._connect() as db:
             async with db.execute(
-                "SELECT * FROM claims WHERE target_id = ? AND type = ? AND guild_id = ?",
-                (target_id, claim_type, guild_id)
+                "SELECT 1 FROM claims WHERE target_id = ? AND type = ? AND claimant_id = ? AND guild_id = ? AND expires_at > ? LIMIT 1",
+                (target_id, claim_type, claimant_id, guild_id, current_time)
             ) as cursor:
-                rows = await cursor.fetchall()
-                return [Claim(**dict(row)) for row in rows]
+                return await cursor.fetchone() is not None
     
     async def add_claim(self, claim: Claim):
-        """Add a claim."""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Add a claim, replacing an expired one from the same claimant."""
+        async with self._write() as db:
             await db.execute("""
                 INSERT INTO claims (target_id, guild_id, type, claimant_id, expires_at)
                 VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (target_id, guild_id, type, claimant_id)
+                DO UPDATE SET expires_at = excluded.expires_at
             """, (claim.target_id, claim.guild_id, claim.type, claim.claimant_id, claim.expires_at))
-            await db.commit()
     
-    async def remove_claim(self, target_id: str, claim_type: str, claimant_id: str, guild_id: str):
-        """Remove a claim."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "DELETE FROM claims WHERE target_id = ? AND type = ? AND claimant_id = ? AND guild_id = ?",
-                (target_id, claim_type, claimant_id, guild_id)
+    async def remove_claim(self, target_id: str, claim_type: str, claimant_id: str, guild_id: str) -> bool:
+        """Remove a live claim. Returns whether there was one to remove."""
+        current_time = now_timestamp()
+        
+        async with self._write() as db:
+            cursor = await db.execute(
+                "DELETE FROM claims WHERE target_id = ? AND type = ? AND claimant_id = ? AND guild_id = ? AND expires_at > ?",
+                (target_id, claim_type, claimant_id, guild_id, current_time)
             )
-            await db.commit()
+            removed = cursor.rowcount > 0
+            await cursor.close()
+            return removed
     
-    async def clear_claims(self, user_id: str, guild_id: str):
-        """Clear all claims for a user in a guild (when they leave)."""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def clear_user_artifacts(self, user_id: str, guild_id: str):
+        """Clear every signature and claim a user made in a guild (when they leave), in one commit."""
+        async with self._write() as db:
+            await db.execute("DELETE FROM signatures WHERE signer_id = ? AND guild_id = ?", (user_id, guild_id))
             await db.execute("DELETE FROM claims WHERE claimant_id = ? AND guild_id = ?", (user_id, guild_id))
-            await db.commit()
+        self._lockout_cache.pop((user_id, guild_id), None)
     
     async def get_state(self, key: str, guild_id: str) -> Optional[str]:
         """Get a state value for a guild."""
-        async with aiosqlite.connect(self.db_path) as db:
+        cache_key = (guild_id, key)
+        if cache_key in self._state_cache:
+            return self._state_cache[cache_key]
+        
+        async with self._connect() as db:
             async with db.execute("SELECT value FROM state WHERE key = ? AND guild_id = ?", (key, guild_id)) as cursor:
                 row = await cursor.fetchone()
-                return row[0] if row else None
+        
+        value = self._state_cache[cache_key] = row[0] if row else None
+        return value
     
     async def set_state(self, key: str, value: str, guild_id: str):
         """Set a state value for a guild."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute(
-                "INSERT OR REPLACE INTO state (guild_id, key, value) VALUES (?, ?, ?)",
+                "INSERT INTO state (guild_id, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (guild_id, key) DO UPDATE SET value = excluded.value",
                 (guild_id, key, value)
             )
-            await db.commit()
+        self._state_cache[(guild_id, key)] = value
     
     async def is_roster_locked(self, guild_id: str) -> bool:
         """Check if the roster is locked (after first elimination) for a guild."""
-        locked = await self.get_state("roster_locked", guild_id)
-        return locked == "1"
+        return await self.get_state("roster_locked", guild_id) == "1"
     
     async def lock_roster(self, guild_id: str):
         """Lock the roster after first elimination for a guild."""
         await self.set_state("roster_locked", "1", guild_id)
     
-    async def get_user_lockouts(self, user_id: str, guild_id: str) -> Dict[str, List[str]]:
-        """Get targets that a user cannot hex/mend due to active signatures in a guild."""
-        await self.purge_expired(guild_id)
+    async def get_user_lockouts(self, user_id: str, guild_id: str, now_ts: Optional[int] = None) -> Dict[str, Tuple[str, ...]]:
+        """Get targets that a user cannot hex/mend due to active signatures in a guild.
         
-        lockouts = {"hex": [], "mend": []}
+        Results are reused for LOCKOUT_CACHE_SECONDS unless an explicit now_ts is given.
+        """
+        key = (user_id, guild_id)
+        if now_ts is None:
+            cached = self._lockout_cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
         
-        async with aiosqlite.connect(self.db_path) as db:
+        current_time = now_ts if now_ts is not None else now_timestamp()
+        hex_targets: List[str] = []
+        mend_targets: List[str] = []
+        
+        async with self._connect() as db:
             async with db.execute(
-                "SELECT target_id, type FROM signatures WHERE signer_id = ? AND guild_id = ?",
-                (user_id, guild_id)
+                "SELECT target_id, type FROM signatures WHERE signer_id = ? AND guild_id = ? AND expires_at > ?",
+                (user_id, guild_id, current_time)
             ) as cursor:
                 rows = await cursor.fetchall()
-                for target_id, sig_type in rows:
-                    lockouts[sig_type].append(target_id)
         
+        for target_id, sig_type in rows:
+            (hex_targets if sig_type == "hex" else mend_targets).append(target_id)
+        
+        lockouts = {"hex": tuple(hex_targets), "mend": tuple(mend_targets)}
+        if now_ts is None:
+            self._lockout_cache[key] = (time.monotonic() + LOCKOUT_CACHE_SECONDS, lockouts)
         return lockouts
     
     async def clear_all_game_data(self, guild_id: str):
         """Clear all game data for a guild for a fresh start."""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute("DELETE FROM players WHERE guild_id = ?", (guild_id,))
             await db.execute("DELETE FROM signatures WHERE guild_id = ?", (guild_id,)) 
             await db.execute("DELETE FROM claims WHERE guild_id = ?", (guild_id,))
             await db.execute("DELETE FROM state WHERE guild_id = ?", (guild_id,))
-            await db.commit()
\ No newline at end of file
+        self._drop_cached_guild(guild_id)
+    
+    def _drop_cached_guild(self, guild_id: str):
+        """Forget cached state and lockouts for a guild after its data is replaced."""
+        for key in [key for key in self._state_cache if key[0] == guild_id]:
+            del self._state_cache[key]
+        for key in [key for key in self._lockout_cache if key[1] == guild_id]:
+            del self._lockout_cache[key]
\ No newline at end of file
@@ -1,23 +1,44 @@
 """Timezone-aware time utilities for the game."""
 
 import datetime
+import time
+from functools import lru_cache
 from zoneinfo import ZoneInfo
-from .config import TIMEZONE
+from .config import TIMEZONE, FRESH_BUCKETS
+
+
+# Resolved once; ZoneInfo lookups are cached but still cost a call on every helper below
+_TZ = ZoneInfo(TIMEZONE)
 
 
 def get_timezone():
     """Get the timezone object for the game."""
-    return ZoneInfo(TIMEZONE)
+    return _TZ
 
 
 def now() -> datetime.datetime:
     """Get current timezone-aware datetime."""
-    return datetime.datetime.now(ZoneInfo(TIMEZONE))
+    return datetime.datetime.now(_TZ)
+
+
+def now_timestamp() -> int:
+    """Get the current POSIX timestamp; the epoch doesn't depend on the game timezone."""
+    return int(time.time())
 
 
 def today_key() -> str:
     """Get today's date as a string key in the game timezone."""
-    return now().strftime("%Y-%m-%d")
+    return _day_key(int(time.time()) // 60)
+
+
+@lru_cache(maxsize=1)
+def _day_key(minute: int) -> str:
+    """Format the game-timezone date for a minute since the epoch.
+    
+    Timezone offsets are whole minutes, so the date can't change partway through a minute
+    and the formatted key is reused for every call within it.
+    """
+    return datetime.datetime.fromtimestamp(minute * 60, _TZ).strftime("%Y-%m-%d")
 
 
 def hours_ago(hours: int) -> datetime.datetime:
@@ -33,22 +54,20 @@ def timestamp_from_hours(hours: int) -> int:
 
 def hours_until(timestamp: int) -> float:
     """Get hours until the given timestamp."""
-    target = datetime.datetime.fromtimestamp(timestamp, ZoneInfo(TIMEZONE))
+    target = datetime.datetime.fromtimestamp(timestamp, _TZ)
     delta = target - now()
     return max(0.0, delta.total_seconds() / 3600)
 
 
 def hours_since(timestamp: int) -> float:
     """Get hours since the given timestamp."""
-    past = datetime.datetime.fromtimestamp(timestamp, ZoneInfo(TIMEZONE))
+    past = datetime.datetime.fromtimestamp(timestamp, _TZ)
     delta = now() - past
     return delta.total_seconds() / 3600
 
 
 def get_freshness_bucket(hours_old: float) -> str:
     """Get freshness bucket label for given age in hours."""
-    from .config import FRESH_BUCKETS
-    
     for min_hours, max_hours, label in FRESH_BUCKETS:
         if min_hours <= hours_old < max_hours:
             return label
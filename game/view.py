@@ -1,14 +1,57 @@
 """View formatting for Ritual War displays."""
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import discord
-from .models import Player, PlayerStatus
-from .storage import GameStorage
+from .models import Player, PlayerStatus, TrainStatus
+from .storage import GameStorage, shares_connection
 from .logic import GameLogic
 from .timeutils import hours_until
 from .config import THRESHOLD
 
 
+# Doom levels that get a warning marker on displays, computed once
+_CRITICAL_DOOM = THRESHOLD * 0.75
+_WARNING_DOOM = THRESHOLD * 0.5
+
+
+def _format_doom(doom: int) -> str:
+    """Format a Doom value with its status indicator."""
+    if doom >= _CRITICAL_DOOM:
+        return f"💀 {doom}/{THRESHOLD}"
+    if doom >= _WARNING_DOOM:
+        return f"⚠️ {doom}/{THRESHOLD}"
+    return f"{doom}/{THRESHOLD}"
+
+
+def _format_marks(label: str, train: TrainStatus) -> str:
+    """Format a train as e.g. "2 Hex Marks (Fresh)"."""
+    marks = f"{train.count} {label} Mark{'' if train.count == 1 else 's'}"
+    return f"{marks} ({train.freshness})" if train.count > 0 else marks
+
+
+def _format_trains(trains: Tuple[TrainStatus, TrainStatus]) -> str:
+    """Format a target's Hex and Mend trains for one leaderboard line."""
+    hex_train, mend_train = trains
+    return f"{_format_marks('Hex', hex_train)} | {_format_marks('Mend', mend_train)}"
+
+
+def _display_name(guild: discord.Guild, user_id: str) -> str:
+    """Get a member's display name, falling back to a mention."""
+    try:
+        member = guild.get_member(int(user_id))
+    except Exception:
+        member = None
+    return member.display_name if member else f"<@{user_id}>"
+
+
+def _cached_name(guild: discord.Guild, user_id: str, names: Dict[str, str]) -> str:
+    """Get a display name through a cache that lives for one render."""
+    name = names.get(user_id)
+    if name is None:
+        name = names[user_id] = _display_name(guild, user_id)
+    return name
+
+
 class GameView:
     """Handles formatting of game displays."""
     
@@ -17,6 +60,7 @@ class GameView:
         self.logic = logic
         self.guild_id = guild_id
     
+    @shares_connection
     async def format_leaderboard(self, guild: discord.Guild) -> discord.Embed:
         """Format the leaderboard display."""
         players = await self.storage.get_active_players(self.guild_id)
@@ -37,37 +81,15 @@ class GameView:
             color=0x800080
         )
         
-        description_lines = []
+        # Every train in the guild in one query instead of one per player
+        trains = await self.logic.get_guild_trains()
+        no_trains = (TrainStatus(0, "Expired"), TrainStatus(0, "Expired"))
         
-        for player in players:
-            try:
-                member = guild.get_member(int(player.user_id))
-                display_name = member.display_name if member else f"<@{player.user_id}>"
-            except:
-                display_name = f"<@{player.user_id}>"
-            
-            # Get train statuses
-            hex_train = await self.logic.get_train_status(player.user_id, "hex")
-            mend_train = await self.logic.get_train_status(player.user_id, "mend")
-            
-            # Format doom with status indicator
-            doom_display = f"{player.doom}/{THRESHOLD}"
-            if player.doom >= THRESHOLD * 0.75:  # 75% threshold
-                doom_display = f"💀 {doom_display}"
-            elif player.doom >= THRESHOLD * 0.5:  # 50% threshold
-                doom_display = f"⚠️ {doom_display}"
-            
-            # Format marks
-            hex_display = f"{hex_train.count} Hex Mark{'s' if hex_train.count != 1 else ''}"
-            if hex_train.count > 0:
-                hex_display += f" ({hex_train.freshness})"
-            
-            mend_display = f"{mend_train.count} Mend Mark{'s' if mend_train.count != 1 else ''}"
-            if mend_train.count > 0:
-                mend_display += f" ({mend_train.freshness})"
-            
-            line = f"**{display_name}** - {doom_display} | {hex_display} | {mend_display}"
-            description_lines.append(line)
+        description_lines = [
+            f"**{_display_name(guild, player.user_id)}** - {_format_doom(player.doom)}"
+            f" | {_format_trains(trains.get(player.user_id, no_trains))}"
+            for player in players
+        ]
         
         embed.description = "\n".join(description_lines)
         
@@ -79,6 +101,7 @@ class GameView:
         
         return embed
     
+    @shares_connection
     async def format_inspect(self, user_id: str, target_id: str, guild: discord.Guild) -> discord.Embed:
         """Format player inspection display."""
         target = await self.storage.get_player(target_id, self.guild_id)
@@ -90,11 +113,9 @@ class GameView:
             )
             return embed
         
-        try:
-            member = guild.get_member(int(target_id))
-            display_name = member.display_name if member else f"<@{target_id}>"
-        except:
-            display_name = f"<@{target_id}>"
+        # Names resolved during this render; lockouts often list the same player twice
+        names: Dict[str, str] = {}
+        display_name = _cached_name(guild, target_id, names)
         
         is_self_inspect = user_id == target_id
         
@@ -104,13 +125,7 @@ class GameView:
         )
         
         # Basic info
-        doom_display = f"{target.doom}/{THRESHOLD}"
-        if target.doom >= THRESHOLD * 0.75:
-            doom_display = f"💀 {doom_display}"
-        elif target.doom >= THRESHOLD * 0.5:
-            doom_display = f"⚠️ {doom_display}"
-        
-        embed.add_field(name="Doom", value=doom_display, inline=True)
+        embed.add_field(name="Doom", value=_format_doom(target.doom), inline=True)
         
         # Veil info (only for self)
         if is_self_inspect and target.veil_until:
@@ -119,19 +134,10 @@ class GameView:
                 embed.add_field(name="🛡️ Veil", value=f"{veil_hours:.1f}h remaining", inline=True)
         
         # Mark info
-        hex_train = await self.logic.get_train_status(target_id, "hex")
-        mend_train = await self.logic.get_train_status(target_id, "mend")
-        
-        hex_display = f"{hex_train.count} Hex Mark{'s' if hex_train.count != 1 else ''}"
-        if hex_train.count > 0:
-            hex_display += f" ({hex_train.freshness})"
-        
-        mend_display = f"{mend_train.count} Mend Mark{'s' if mend_train.count != 1 else ''}"
-        if mend_train.count > 0:
-            mend_display += f" ({mend_train.freshness})"
+        hex_train, mend_train = await self.logic.get_trains(target_id)
         
-        embed.add_field(name="Hex Marks", value=hex_display, inline=True)
-        embed.add_field(name="Mend Marks", value=mend_display, inline=True)
+        embed.add_field(name="Hex Marks", value=_format_marks("Hex", hex_train), inline=True)
+        embed.add_field(name="Mend Marks", value=_format_marks("Mend", mend_train), inline=True)
         
         # Lockouts (only for self)
         if is_self_inspect:
@@ -141,26 +147,12 @@ class GameView:
                 lockout_lines = []
                 
                 if lockouts["hex"]:
-                    hex_targets = []
-                    for target_user_id in lockouts["hex"]:
-                        try:
-                            member = guild.get_member(int(target_user_id))
-                            name = member.display_name if member else f"<@{target_user_id}>"
-                            hex_targets.append(name)
-                        except:
-                            hex_targets.append(f"<@{target_user_id}>")
-                    lockout_lines.append(f"**Hex blocked:** {', '.join(hex_targets)}")
+                    hex_targets = ", ".join(_cached_name(guild, uid, names) for uid in lockouts["hex"])
+                    lockout_lines.append(f"**Hex blocked:** {hex_targets}")
                 
                 if lockouts["mend"]:
-                    mend_targets = []
-                    for target_user_id in lockouts["mend"]:
-                        try:
-                            member = guild.get_member(int(target_user_id))
-                            name = member.display_name if member else f"<@{target_user_id}>"
-                            mend_targets.append(name)
-                        except:
-                            mend_targets.append(f"<@{target_user_id}>")
-                    lockout_lines.append(f"**Mend blocked:** {', '.join(mend_targets)}")
+                    mend_targets = ", ".join(_cached_name(guild, uid, names) for uid in lockouts["mend"])
+                    lockout_lines.append(f"**Mend blocked:** {mend_targets}")
                 
                 embed.add_field(
                     name="🚫 Active Signatures (Lockouts)",